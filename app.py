@@ -1,136 +1,265 @@
 import streamlit as st
 import pandas as pd
 import os
-import joblib
-import matplotlib.pyplot as plt
-import seaborn as sns
-from src.visualization import TrafficVisualizer
+import inspect
+from src import queries
+from src.aggregates import TrafficCube, data_version
+from src.manifest import load_manifest, stage_is_current
+from src.artifacts import load_artifact
+from src import instrumentation
+from src.instrumentation import span
 
 # Page Config
 st.set_page_config(page_title="Smart City Traffic Analysis", page_icon="🏙️", layout="wide")
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_PATH = os.path.join(BASE_DIR, "data", "processed", "traffic_enhanced.csv")
+DATA_STEM = os.path.join(BASE_DIR, "data", "processed", "traffic_enhanced")
+CUBE_STEM = os.path.join(BASE_DIR, "data", "processed", "traffic_cube")
+SKETCH_STEM = os.path.join(BASE_DIR, "data", "processed", "traffic_volume_sketch")
+MANIFEST_PATH = os.path.join(BASE_DIR, "data", "processed", "manifest.json")
 MODELS_DIR = os.path.join(BASE_DIR, "data", "models")
+RF_MODEL_PATH = os.path.join(MODELS_DIR, "rf_traffic_predictor.pkl")
 LABEL_ENCODER_PATH = os.path.join(BASE_DIR, "data", "processed", "weather_encoder.pkl")
+FORECAST_CACHE_DIR = os.path.join(BASE_DIR, "data", "processed", "forecasts")
+METRICS_PATH = os.path.join(BASE_DIR, "data", "processed", "metrics.jsonl")
+
+@st.cache_resource
+def get_connection():
+    con = queries.connect(DATA_STEM)
+    if con is None:
+        # Raised rather than returned so the failure is not cached: the data appears once the pipeline runs
+        raise FileNotFoundError(f"No dataset at {DATA_STEM}")
+    return con
 
 @st.cache_data
-def load_data():
-    if os.path.exists(DATA_PATH):
-        df = pd.read_csv(DATA_PATH)
-        df['date_time'] = pd.to_datetime(df['date_time'])
-        return df
-    return None
-
-def load_models():
+def run_query(name, years=(), version=None, **kwargs):
+    """Runs a src.queries aggregate; results are small and cached per filter selection and data version."""
+    return getattr(queries, name)(get_connection().cursor(), list(years), **kwargs)
+
+@st.cache_resource
+def load_cube(version):
+    """Precomputed aggregate cube, cached per data version."""
+    return TrafficCube.load(CUBE_STEM, SKETCH_STEM, DATA_STEM, MANIFEST_PATH)
+
+def current_data():
+    """(data version of the dashboard dataset, aggregate cube or None when it is stale).
+
+    Called once per rerun by main(); the tabs and plots receive the result.
+    """
+    # The data version is a content hash cached in the manifest, so this check is cheap on every rerun
+    manifest = load_manifest(MANIFEST_PATH)
+    version = data_version(DATA_STEM, manifest)
+    cube = load_cube(version) if version and stage_is_current(manifest, "aggregate", version) else None
+    return version, cube
+
+def aggregate(name, years, version, cube):
+    """Renders from the aggregate cube when it is current, otherwise from a DuckDB query."""
+    with span(f"app.aggregate.{name}") as recorded:
+        if cube is not None and hasattr(cube, name):
+            result = getattr(cube, name)(list(years))
+        else:
+            result = run_query(name, years, version)
+        recorded.rows = len(result)
+    return result
+
+# Data behind each plot: (query name, whether the aggregate cube can answer it)
+PLOT_DATA = {
+    'plot_hourly_traffic': ('hourly_by_weekday', True),
+    'plot_weather_impact': ('weather_box_stats', True),
+    'plot_correlation': ('correlation', False),
+    'plot_cluster_segments': ('scatter_sample', False),
+    'plot_anomalies': ('scatter_sample', False),
+}
+
+@st.cache_data(max_entries=128)
+def figure_png(plot, years, version, _cube):
+    """A TrafficVisualizer plot rendered to PNG, cached per (plot, year selection, data version).
+
+    Reruns with an unchanged filter skip both the query and matplotlib's drawing.
+    """
+    # matplotlib/seaborn load on the first plot, not before the page's first paint
+    from src.visualization import TrafficVisualizer
+
+    query, from_cube = PLOT_DATA[plot]
+    data = aggregate(query, years, version, _cube) if from_cube else run_query(query, years, version)
+    return TrafficVisualizer.to_png(getattr(TrafficVisualizer(), plot)(data))
+
+def show_plot(plot, years, version, cube):
+    st.image(figure_png(plot, years, version, cube))
+
+def lazy_tabs(labels):
+    """Tabs whose bodies run only while selected, where Streamlit supports it (`tab.open`)."""
+    if 'on_change' in inspect.signature(st.tabs).parameters:
+        return st.tabs(labels, key="view", on_change="rerun")
+    return st.tabs(labels)
+
+def is_open(tab):
+    # None when the Streamlit version does not track the selected tab: render everything
+    return getattr(tab, 'open', None) is not False
+
+def model_version():
+    """Size and mtime of the regressor file; the models are reloaded when it changes."""
+    if not os.path.exists(RF_MODEL_PATH):
+        return None
+    stat = os.stat(RF_MODEL_PATH)
+    return stat.st_size, stat.st_mtime_ns
+
+@st.cache_resource(max_entries=1)
+def load_models(version):
+    """(kmeans, predictor, encoders); errors propagate, so a failed load is retried on the next run."""
+    from src.prediction import TrafficPredictor
+
+    kmeans = load_artifact(os.path.join(MODELS_DIR, "kmeans_traffic.pkl"))
+    encoders = load_artifact(LABEL_ENCODER_PATH)
+    # The dashboard scores single rows and small grids: use the flattened forest and a prediction cache
+    predictor = TrafficPredictor(RF_MODEL_PATH, encoders=encoders, fast_path_rows=256, cache_size=100_000)
+    return kmeans, predictor, encoders
+
+@st.cache_resource(max_entries=1)
+def get_forecaster(_predictor, version):
+    """Forecaster sharing the loaded model (one per model version); it caches forecasts per data origin and model."""
+    from src.forecasting import TrafficForecaster
+
+    return TrafficForecaster(_predictor, history_stem=DATA_STEM, cache_dir=FORECAST_CACHE_DIR)
+
+def render_overview(years, version, cube):
+    stats = aggregate("summary", years, version, cube).iloc[0]
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total Records", f"{int(stats['records']):,}")
+    col2.metric("Avg Traffic Volume", f"{int(stats['avg_volume']):,}")
+    col3.metric("Anomalies Detected", f"{int(stats['anomalies']):,}")
+    
+    st.markdown("#### Hourly Traffic Trend")
+    show_plot("plot_hourly_traffic", years, version, cube)
+
+    st.markdown("#### Anomalies by Year")
+    st.bar_chart(aggregate("anomaly_counts_by_year", (), version, cube).set_index('year')['anomalies'])
+
+def render_patterns(years, version, cube):
+    st.subheader("Traffic Clusters & Anomalies")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Traffic Clusters (K-Means)**")
+        show_plot("plot_cluster_segments", years, version, cube)
+    with col2:
+        st.markdown("**Detected Anomalies (Isolation Forest)**")
+        show_plot("plot_anomalies", years, version, cube)
+
+def render_weather(years, version, cube):
+    st.subheader("Environmental Impact on Traffic")
+    show_plot("plot_weather_impact", years, version, cube)
+    
+    st.markdown("#### Correlation Heatmap")
+    show_plot("plot_correlation", years, version, cube)
+
+def render_prediction():
+    from src.prediction import WEATHER_SCENARIOS
+
+    # Models (and sklearn) load the first time this tab opens
+    version = model_version()
     try:
-        kmeans = joblib.load(os.path.join(MODELS_DIR, "kmeans_traffic.pkl"))
-        rf = joblib.load(os.path.join(MODELS_DIR, "rf_traffic_predictor.pkl"))
-        encoders = joblib.load(LABEL_ENCODER_PATH)
-        return kmeans, rf, encoders
+        _, predictor, encoders = load_models(version)
     except Exception as e:
         st.error(f"Error loading models: {e}")
-        return None, None, None
+        return
+    st.subheader("Traffic Congestion Prediction")
+    st.markdown("Enter details to predict traffic volume.")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        p_hour = st.slider("Hour of Day", 0, 23, 12)
+        p_day = st.selectbox("Day of Week", range(7), format_func=lambda x: ['Mon','Tue','Wed','Thu','Fri','Sat','Sun'][x])
+        p_month = st.slider("Month", 1, 12, 6)
+    
+    with col2:
+        p_temp = st.number_input("Temperature (Kelvin)", 200.0, 320.0, 280.0)
+        p_rain = st.number_input("Rain (1h mm)", 0.0, 100.0, 0.0)
+        p_clouds = st.slider("Cloud Coverage (%)", 0, 100, 20)
+        p_weather = st.selectbox("Weather Main", encoders['main'].classes_)
+        p_desc = st.selectbox("Weather Description", encoders['desc'].classes_)
+
+    if st.button("Predict Traffic Volume"):
+        try:
+            # Prepare input (weather labels are encoded by the predictor)
+            features = pd.DataFrame([{
+                'hour': p_hour, 'day_of_week': p_day, 'month': p_month,
+                'weather_main': p_weather, 'weather_description': p_desc,
+                'temp': p_temp, 'rain_1h': p_rain, 'snow_1h': 0, 'clouds_all': p_clouds
+            }])
+            
+            prediction = predictor.predict(features)[0]
+            st.success(f"Predicted Traffic Volume: **{int(prediction)}** cars/hour")
+            
+            # Context
+            if prediction > 5000:
+                st.error("High Congestion Expected! 🚗🟥")
+            elif prediction > 3000:
+                st.warning("Moderate Traffic. 🚗🟨")
+            else:
+                st.success("Free Flowing Traffic. 🚗🟩")
+        except Exception as e:
+            st.error(f"Prediction Error: {e}")
+
+    st.subheader("Forecast")
+    f_horizons = st.select_slider("Hours ahead", options=[24, 48, 72, 168], value=168)
+    f_scenarios = st.multiselect("Weather scenarios", list(WEATHER_SCENARIOS), default=list(WEATHER_SCENARIOS))
+    if f_scenarios:
+        forecast = get_forecaster(predictor, version).forecast(f_horizons, {name: WEATHER_SCENARIOS[name] for name in f_scenarios})
+        if forecast is not None:
+            st.line_chart(forecast.pivot(index='date_time', columns='scenario', values='predicted_volume'))
+
+def render_performance():
+    st.subheader("Slowest Operations")
+    if not instrumentation.is_enabled():
+        st.info("Timing is off. Enable \"Record timings\" in the sidebar (or set TRAFFIC_METRICS=1) and rerun.")
+    source = st.radio("Records", ["Since app start", "All runs (metrics.jsonl)"], horizontal=True)
+    records = instrumentation.recent_records() if source == "Since app start" else instrumentation.load_records(METRICS_PATH)
+    if records:
+        st.dataframe(instrumentation.summarize(records), hide_index=True)
+        st.markdown("#### Latest calls")
+        latest = pd.DataFrame.from_records(records[-200:])
+        st.dataframe(latest.sort_values('wall_s', ascending=False)[['ts', 'name', 'parent', 'wall_s', 'cpu_s', 'rows', 'rss_mb']],
+                     hide_index=True)
 
 def main():
     st.title("🏙️ Smart City Big Data Analytics")
     st.markdown("### Urban Traffic, Population & Environmental Insights")
     
-    df = load_data()
-    if df is None:
+    try:
+        get_connection()
+    except FileNotFoundError:
         st.error("Data not found. Please run the data pipeline first.")
         return
 
-    viz = TrafficVisualizer(df)
-    kmeans_model, rf_model, encoders = load_models()
-
     # Sidebar
     st.sidebar.header("Project Info")
     st.sidebar.info("This dashboard visualizes traffic patterns, detects anomalies, and predicts congestion using Big Data techniques.")
     
     st.sidebar.subheader("Filter Data")
-    year_filter = st.sidebar.multiselect("Select Year", options=sorted(df['year'].unique()), default=sorted(df['year'].unique())[-1:])
-    
-    if year_filter:
-        df_filtered = df[df['year'].isin(year_filter)]
-    else:
-        df_filtered = df
-
-    # Tabs
-    tab1, tab2, tab3, tab4 = st.tabs(["📊 Overview", "🚦 Traffic Patterns", "🌥️ Weather Impact", "🔮 Prediction"])
-
-    with tab1:
-        col1, col2, col3 = st.columns(3)
-        col1.metric("Total Records", f"{len(df_filtered):,}")
-        col2.metric("Avg Traffic Volume", f"{int(df_filtered['traffic_volume'].mean()):,}")
-        col3.metric("Anomalies Detected", f"{df_filtered['is_anomaly'].sum():,}")
-        
-        st.markdown("#### Hourly Traffic Trend")
-        st.pyplot(viz.plot_hourly_traffic())
-
-    with tab2:
-        st.subheader("Traffic Clusters & Anomalies")
-        col1, col2 = st.columns(2)
-        with col1:
-            st.markdown("**Traffic Clusters (K-Means)**")
-            st.pyplot(viz.plot_cluster_segments())
-        with col2:
-            st.markdown("**Detected Anomalies (Isolation Forest)**")
-            st.pyplot(viz.plot_anomalies())
-            
-    with tab3:
-        st.subheader("Environmental Impact on Traffic")
-        st.pyplot(viz.plot_weather_impact())
-        
-        st.markdown("#### Correlation Heatmap")
-        fig, ax = plt.subplots(figsize=(10, 6))
-        corr = df_filtered[['traffic_volume', 'temp', 'rain_1h', 'snow_1h', 'clouds_all', 'hour']].corr()
-        sns.heatmap(corr, annot=True, cmap='coolwarm', ax=ax)
-        st.pyplot(fig)
-
-    with tab4:
-        st.subheader("Traffic Congestion Prediction")
-        st.markdown("Enter details to predict traffic volume.")
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            p_hour = st.slider("Hour of Day", 0, 23, 12)
-            p_day = st.selectbox("Day of Week", range(7), format_func=lambda x: ['Mon','Tue','Wed','Thu','Fri','Sat','Sun'][x])
-            p_month = st.slider("Month", 1, 12, 6)
-        
-        with col2:
-            p_temp = st.number_input("Temperature (Kelvin)", 200.0, 320.0, 280.0)
-            p_rain = st.number_input("Rain (1h mm)", 0.0, 100.0, 0.0)
-            p_clouds = st.slider("Cloud Coverage (%)", 0, 100, 20)
-            p_weather = st.selectbox("Weather Main", encoders['main'].classes_)
-            p_desc = st.selectbox("Weather Description", encoders['desc'].classes_)
-
-        if st.button("Predict Traffic Volume"):
-            try:
-                # Prepare input
-                is_weekend = 1 if p_day >= 5 else 0
-                w_main_code = encoders['main'].transform([p_weather])[0]
-                w_desc_code = encoders['desc'].transform([p_desc])[0]
-                
-                features = pd.DataFrame([{
-                    'hour': p_hour, 'day_of_week': p_day, 'month': p_month, 'is_weekend': is_weekend,
-                    'weather_main_code': w_main_code, 'weather_description_code': w_desc_code,
-                    'temp': p_temp, 'rain_1h': p_rain, 'snow_1h': 0, 'clouds_all': p_clouds
-                }])
-                
-                prediction = rf_model.predict(features)[0]
-                st.success(f"Predicted Traffic Volume: **{int(prediction)}** cars/hour")
-                
-                # Context
-                if prediction > 5000:
-                    st.error("High Congestion Expected! 🚗🟥")
-                elif prediction > 3000:
-                    st.warning("Moderate Traffic. 🚗🟨")
-                else:
-                    st.success("Free Flowing Traffic. 🚗🟩")
-            except Exception as e:
-                st.error(f"Prediction Error: {e}")
+    all_years = queries.years(get_connection().cursor())
+    year_filter = st.sidebar.multiselect("Select Year", options=all_years, default=all_years[-1:])
+    years = tuple(sorted(year_filter))
+
+    if st.sidebar.checkbox("Record timings", value=instrumentation.is_enabled()):
+        if not instrumentation.is_enabled():
+            instrumentation.enable(METRICS_PATH)
+    elif instrumentation.is_enabled():
+        instrumentation.disable()
+
+    # Data version and cube are looked up once per rerun and shared by every tab
+    version, cube = current_data()
+
+    # Tabs: only the selected one runs
+    tabs = lazy_tabs(["📊 Overview", "🚦 Traffic Patterns", "🌥️ Weather Impact", "🔮 Prediction", "⏱️ Performance"])
+    renders = [("overview", lambda: render_overview(years, version, cube)),
+               ("patterns", lambda: render_patterns(years, version, cube)),
+               ("weather", lambda: render_weather(years, version, cube)), ("prediction", render_prediction),
+               ("performance", render_performance)]
+    for tab, (name, render) in zip(tabs, renders):
+        if is_open(tab):
+            with tab, span(f"app.tab.{name}"):
+                render()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,72 @@
+"""Streaming anomaly detector vs the batch IsolationForest: throughput and agreement.
+
+Run from the project root after mining:  python -m benchmarks.bench_anomaly
+"""
+import time
+import argparse
+import numpy as np
+from sklearn.ensemble import IsolationForest
+from src.storage import ENHANCED_STEM, load_dataset
+from src.online_anomaly import OnlineAnomalyDetector, IsolationForestScorer
+
+
+def agreement(online, batch):
+    both = int((online & batch).sum())
+    either = int((online | batch).sum())
+    return {
+        'online_flagged': int(online.sum()), 'batch_flagged': int(batch.sum()),
+        'agreement': float((online == batch).mean()), 'jaccard': both / either if either else 1.0,
+        'batch_recall': both / batch.sum() if batch.sum() else 1.0,
+    }
+
+
+def run(threshold, batch_size):
+    df = load_dataset(ENHANCED_STEM, columns=['date_time', 'traffic_volume', 'hour', 'day_of_week', 'is_anomaly'])
+    if df is None:
+        print("Enhanced data not found. Run mining first.")
+        return
+    hours = df['hour'].to_numpy(dtype=np.int64)
+    days = df['day_of_week'].to_numpy(dtype=np.int64)
+    volumes = df['traffic_volume'].to_numpy(dtype=np.float64)
+    n = len(df)
+
+    detector = OnlineAnomalyDetector(threshold=threshold)
+    start = time.perf_counter()
+    online = np.fromiter((detector.update(h, d, v) for h, d, v in zip(hours.tolist(), days.tolist(), volumes.tolist())),
+                         dtype=bool, count=n)
+    per_record = time.perf_counter() - start
+
+    detector_b = OnlineAnomalyDetector(threshold=threshold)
+    start = time.perf_counter()
+    online_b = np.concatenate([detector_b.update_batch(hours[i:i + batch_size], days[i:i + batch_size], volumes[i:i + batch_size])
+                               for i in range(0, n, batch_size)])
+    batched = time.perf_counter() - start
+
+    scorer = IsolationForestScorer()
+    start = time.perf_counter()
+    persisted = scorer.is_anomaly(volumes, hours)
+    scoring = time.perf_counter() - start
+
+    start = time.perf_counter()
+    IsolationForest(contamination=0.01, random_state=42).fit_predict(df[['traffic_volume', 'hour']])
+    refit = time.perf_counter() - start
+
+    print(f"{'path':<34} {'seconds':>8} {'records/s':>12} {'us/record':>10}")
+    for name, seconds in [('online, per record', per_record), (f'online, batches of {batch_size}', batched),
+                          ('persisted IsolationForest scoring', scoring), ('batch IsolationForest refit', refit)]:
+        print(f"{name:<34} {seconds:>8.3f} {n / seconds:>12,.0f} {seconds / n * 1e6:>10.2f}")
+
+    batch_flags = df['is_anomaly'].to_numpy(dtype=bool)
+    print("\nAgreement with the batch IsolationForest labels:")
+    for name, flags in [('online, per record', online), (f'online, batches of {batch_size}', online_b),
+                        ('persisted IsolationForest scoring', persisted)]:
+        stats = agreement(flags, batch_flags)
+        print(f"  {name:<34} " + ", ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in stats.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threshold", type=float, default=3.5)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    run(args.threshold, args.batch_size)
@@ -0,0 +1,60 @@
+"""Runtime and peak memory of full KMeans vs chunked MiniBatchKMeans clustering.
+
+Run from the project root:  python -m benchmarks.bench_clustering [--sizes 40000 1000000 10000000]
+
+Larger inputs are synthesized by resampling the processed rows with volume jitter.
+Full KMeans at 10M rows takes a long time; cap it with --max-kmeans-rows.
+"""
+import time
+import argparse
+import tracemalloc
+import numpy as np
+from sklearn.cluster import KMeans
+from src.storage import PROCESSED_STEM, load_dataset
+from src.clustering import CLUSTER_FEATURES, ScalableClusterer
+
+
+def scaled_features(base, n_rows, seed=42):
+    if n_rows <= len(base):
+        return base[:n_rows]
+    rng = np.random.default_rng(seed)
+    X = base[rng.integers(0, len(base), n_rows)]
+    X[:, 0] += rng.normal(0, 50, n_rows).astype(np.float32)
+    return X
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+
+def run(sizes, max_kmeans_rows):
+    df = load_dataset(PROCESSED_STEM, columns=CLUSTER_FEATURES)
+    if df is None:
+        print("Processed data not found. Run preprocessing first.")
+        return
+    base = df.to_numpy(dtype=np.float32)
+
+    print(f"{'rows':>12} {'engine':<10} {'seconds':>9} {'peak MB':>9}")
+    for n_rows in sizes:
+        X = scaled_features(base, n_rows)
+        if max_kmeans_rows is None or n_rows <= max_kmeans_rows:
+            seconds, peak = measure(lambda: KMeans(n_clusters=4, random_state=42, n_init=10).fit_predict(X))
+            print(f"{n_rows:>12,} {'kmeans':<10} {seconds:>9.2f} {peak:>9.1f}")
+        else:
+            print(f"{n_rows:>12,} {'kmeans':<10} {'skipped':>9}")
+        seconds, peak = measure(lambda: ScalableClusterer(n_clusters=4).fit(X).predict(X))
+        print(f"{n_rows:>12,} {'minibatch':<10} {seconds:>9.2f} {peak:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[40_000, 1_000_000, 10_000_000])
+    parser.add_argument("--max-kmeans-rows", type=int, default=None)
+    args = parser.parse_args()
+    run(args.sizes, args.max_kmeans_rows)
@@ -0,0 +1,55 @@
+"""Micro-benchmark: per-row `apply` feature engineering vs the vectorized `build_features`.
+
+Run from the project root:  python -m benchmarks.bench_features [--sizes 1000000 10000000]
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from src.features import build_features
+
+
+def legacy_features(df):
+    """The original per-row implementation, kept here as the baseline."""
+    df['hour'] = df['date_time'].dt.hour
+    df['day_of_week'] = df['date_time'].dt.dayofweek
+    df['month'] = df['date_time'].dt.month
+    df['year'] = df['date_time'].dt.year
+    df['is_weekend'] = df['day_of_week'].apply(lambda x: 1 if x >= 5 else 0)
+
+    def get_time_slot(h):
+        if 6 <= h < 10: return 'Morning Rush'
+        elif 10 <= h < 16: return 'Work Hours'
+        elif 16 <= h < 20: return 'Evening Rush'
+        else: return 'Off Peak'
+
+    df['time_slot'] = df['hour'].apply(get_time_slot)
+    return df
+
+
+def make_frame(n_rows):
+    start = pd.Timestamp("2012-10-02")
+    return pd.DataFrame({'date_time': start + pd.to_timedelta(np.arange(n_rows), unit='h')})
+
+
+def timed(func, df):
+    start = time.perf_counter()
+    out = func(df.copy())
+    return time.perf_counter() - start, out
+
+
+def run(sizes):
+    print(f"{'rows':>12} {'apply s':>10} {'vectorized s':>13} {'speedup':>8}")
+    for n_rows in sizes:
+        df = make_frame(n_rows)
+        legacy_s, legacy = timed(legacy_features, df)
+        fast_s, fast = timed(build_features, df)
+        assert (legacy['is_weekend'].to_numpy() == fast['is_weekend'].to_numpy()).all()
+        assert (legacy['time_slot'].to_numpy() == fast['time_slot'].astype(str).to_numpy()).all()
+        print(f"{n_rows:>12,} {legacy_s:>10.3f} {fast_s:>13.3f} {legacy_s / fast_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    run(parser.parse_args().sizes)
@@ -0,0 +1,63 @@
+"""Inference latency: sklearn predict vs the flattened forest and the prediction cache.
+
+Run from the project root after mining:  python -m benchmarks.bench_inference [--batch-rows 10000]
+
+Single rows and a batch of the most recent processed hours are scored by the saved
+regressor through sklearn, the FlatForest walk and a warm PredictionCache; the
+largest absolute difference from sklearn is reported for each.
+"""
+import time
+import argparse
+import warnings
+import numpy as np
+from src.storage import PROCESSED_STEM, load_dataset
+from src.features import MODEL_FEATURES
+from src.artifacts import load_artifact
+from src.prediction import RF_MODEL_PATH
+from src.inference import HAS_NUMBA, FlatForest, PredictionCache
+
+
+def latency(func, X, repeats):
+    func(X) # warm-up (and cache fill)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = func(X)
+    return (time.perf_counter() - start) / repeats, result
+
+
+def run(batch_rows, single_calls):
+    processed = load_dataset(PROCESSED_STEM, columns=MODEL_FEATURES)
+    if processed is None:
+        print("Processed data not found. Run preprocessing first.")
+        return
+    batch = processed[MODEL_FEATURES].to_numpy(dtype=np.float32)[-batch_rows:]
+    model = load_artifact(RF_MODEL_PATH)
+    model.n_jobs = 1
+
+    start = time.perf_counter()
+    forest = FlatForest.from_model(model)
+    print(f"Flattened {len(forest.roots)} trees ({len(forest.value):,} nodes, {forest.nbytes / 1e6:.0f} MB) "
+          f"in {time.perf_counter() - start:.2f}s; numba: {'yes' if HAS_NUMBA else 'no'}")
+
+    cache = PredictionCache(maxsize=len(batch) * 2, decimals=None)
+    engines = {
+        'sklearn': model.predict,
+        'flat forest': forest.predict,
+        'flat + cache (warm)': lambda X: cache.predict(X, forest.predict),
+    }
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        reference = model.predict(batch)
+        print(f"\n{'engine':<22} {'single row ms':>14} {f'{len(batch):,} rows ms':>14} {'max |diff|':>11}")
+        for name, predict in engines.items():
+            single, _ = latency(predict, batch[:1], single_calls)
+            batched, result = latency(predict, batch, 3)
+            print(f"{name:<22} {single * 1000:>14.3f} {batched * 1000:>14.1f} {np.abs(result - reference).max():>11.2e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-rows", type=int, default=10_000)
+    parser.add_argument("--single-calls", type=int, default=200)
+    args = parser.parse_args()
+    run(args.batch_rows, args.single_calls)
@@ -0,0 +1,64 @@
+"""Peak RSS of TrafficMiner training, default loading vs compact (downcast load + shared float32 matrix).
+
+Run from the project root:  python -m benchmarks.bench_mining_memory [--rows 1000000 4000000]
+
+Longer histories are synthesized by repeating the processed rows with shifted
+timestamps and saved to a temporary dataset. Each run loads it in a fresh process,
+so its peak RSS is its own; "above base" excludes the interpreter and libraries.
+"""
+import os
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from src.storage import PROCESSED_STEM, load_dataset, save_dataset
+from src.mining import TrafficMiner
+from src.instrumentation import peak_rss_mb
+
+
+def long_history(n_rows):
+    base = load_dataset(PROCESSED_STEM)
+    span = base['date_time'].max() - base['date_time'].min() + pd.Timedelta(hours=1)
+    tiles = []
+    for i in range(-(-n_rows // len(base))):
+        tiles.append(base.assign(date_time=base['date_time'] + i * span))
+    return pd.concat(tiles, ignore_index=True).iloc[:n_rows]
+
+
+def train(stem, compact, variant, models_dir):
+    base_rss = peak_rss_mb()
+    miner = TrafficMiner(models_dir=models_dir, n_jobs=1)
+    miner.df = load_dataset(stem, downcast=compact)
+    if compact:
+        miner.compact()
+    miner.train_clustering()
+    miner.detect_anomalies()
+    miner.train_prediction_model(variant=variant)
+    return dict(miner.memory_report(), base_rss_mb=base_rss, peak_rss_mb=peak_rss_mb())
+
+
+def run(row_counts, variant):
+    work_dir = tempfile.mkdtemp(prefix="bench_mining_memory_")
+    try:
+        print(f"{'rows':>10} {'mode':<8} {'frame MB':>9} {'matrix MB':>10} {'copies':>7} {'views':>6} "
+              f"{'peak RSS MB':>12} {'above base':>11}")
+        for n_rows in row_counts:
+            stem = os.path.join(work_dir, f"history_{n_rows}")
+            save_dataset(long_history(n_rows), stem)
+            for compact in (False, True):
+                with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as pool:
+                    r = pool.submit(train, stem, compact, variant, os.path.join(work_dir, "models")).result()
+                print(f"{n_rows:>10,} {'compact' if compact else 'default':<8} {r['frame_mb']:>9.1f} "
+                      f"{r.get('matrix_mb', 0):>10.1f} {r['copies']:>7} {r['views']:>6} "
+                      f"{r['peak_rss_mb']:>12.0f} {r['peak_rss_mb'] - r['base_rss_mb']:>11.0f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 4_000_000])
+    parser.add_argument("--variant", default="small")
+    args = parser.parse_args()
+    run(args.rows, args.variant)
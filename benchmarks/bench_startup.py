@@ -0,0 +1,74 @@
+"""Cold-start cost of each command-line entry point and of the dashboard script.
+
+Run from the project root:  python -m benchmarks.bench_startup [--repeats 5] [--root PATH]
+
+Each command's module runs with `--help` in a fresh interpreter under
+`python -X importtime`. It reports the median wall time, the total import time and
+the packages that took longest to import. `--root` measures another checkout (e.g.
+an older commit in a git worktree), which gives before/after numbers.
+"""
+import os
+import sys
+import argparse
+import subprocess
+import statistics
+import time
+from collections import Counter
+
+# Command name -> how to start it; modules run as `python -m <module> --help`
+ENTRY_POINTS = {
+    'ingest': ['-m', 'src.data_loader', '--help'],
+    'preprocess': ['-m', 'src.preprocessing', '--help'],
+    'mine': ['-m', 'src.mining', '--help'],
+    'predict': ['-m', 'src.prediction', '--help'],
+    'bench': ['-m', 'benchmarks.suite', '--help'],
+    'cli': ['-m', 'src.cli', '--help'],
+    'app (import)': ['-c', 'import app'],
+}
+
+
+def import_times(stderr):
+    """Self import time in seconds per top-level package, from `-X importtime` output."""
+    packages = Counter()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        packages[name.strip().split(".")[0]] += int(self_us) / 1e6
+    return packages
+
+
+def measure(args, root, repeats):
+    walls, imports = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=root, capture_output=True, text=True)
+        walls.append(time.perf_counter() - start)
+        imports.append(import_times(result.stderr))
+    if result.returncode != 0:
+        return None
+    median = sorted(imports, key=lambda packages: sum(packages.values()))[len(imports) // 2]
+    return statistics.median(walls), median
+
+
+def run(root, repeats, top):
+    print(f"{'entry point':<14} {'wall s':>7} {'imports s':>10}  slowest packages")
+    for name, args in ENTRY_POINTS.items():
+        if args[0] == '-m' and not os.path.exists(os.path.join(root, *args[1].split('.')) + '.py'):
+            continue
+        measured = measure(args, root, repeats)
+        if measured is None:
+            print(f"{name:<14} failed")
+            continue
+        wall, packages = measured
+        slowest = ", ".join(f"{package} {seconds:.2f}" for package, seconds in packages.most_common(top))
+        print(f"{name:<14} {wall:>7.2f} {sum(packages.values()):>10.2f}  {slowest}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", default=".", help="Project checkout to measure.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--top", type=int, default=4, help="Slowest packages to list per entry point.")
+    args = parser.parse_args()
+    run(os.path.abspath(args.root), args.repeats, args.top)
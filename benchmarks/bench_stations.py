@@ -0,0 +1,44 @@
+"""Scaling of per-station processing across worker processes.
+
+Run from the project root:  python -m benchmarks.bench_stations [--stations 16] [--workers 1 2 4 8]
+
+Synthetic stations are generated into a temporary directory from the Metro data;
+each worker count preprocesses and mines all of them from scratch.
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+from src.stations import generate_stations, process_stations
+
+
+def run(n_stations, worker_counts, variant):
+    work_dir = tempfile.mkdtemp(prefix="bench_stations_")
+    try:
+        raw_dir = os.path.join(work_dir, "raw")
+        generate_stations(n_stations, raw_dir)
+        results = []
+        for workers in worker_counts:
+            start = time.perf_counter()
+            process_stations(raw_dir, workers=workers, variant=variant, force=True,
+                             root=os.path.join(work_dir, "processed"), models_root=os.path.join(work_dir, "models"),
+                             use_manifest=False)
+            results.append((workers, time.perf_counter() - start))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    baseline = results[0][1]
+    print(f"\n{n_stations} stations, variant={variant} ({os.cpu_count()} CPUs)")
+    print(f"{'workers':>8} {'seconds':>9} {'speedup':>8} {'stations/s':>11}")
+    for workers, seconds in results:
+        print(f"{workers:>8} {seconds:>9.2f} {baseline / seconds:>8.2f} {n_stations / seconds:>11.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=16)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--variant", default="small")
+    args = parser.parse_args()
+    run(args.stations, args.workers, args.variant)
@@ -0,0 +1,42 @@
+"""Compares cold-load time and in-memory size of the processed dataset in CSV vs Parquet.
+
+Run from the project root:  python -m benchmarks.bench_storage
+"""
+import os
+import tempfile
+import time
+from src.storage import PROCESSED_STEM, HAS_PYARROW, load_dataset, save_dataset
+
+DASHBOARD_COLUMNS = ['date_time', 'traffic_volume', 'hour', 'day_of_week', 'year', 'weather_description']
+
+
+def time_load(stem, fmt, columns=None, repeats=3):
+    best = float('inf')
+    df = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        df = load_dataset(stem, columns=columns, fmt=fmt)
+        best = min(best, time.perf_counter() - start)
+    return best, df.memory_usage(deep=True).sum()
+
+
+def run():
+    df = load_dataset(PROCESSED_STEM)
+    if df is None:
+        print("Processed data not found. Run preprocessing first.")
+        return
+
+    formats = ['csv'] + (['parquet'] if HAS_PYARROW else [])
+    with tempfile.TemporaryDirectory() as tmp:
+        stem = os.path.join(tmp, "traffic")
+        print(f"{'format':<8} {'columns':<10} {'file MB':>8} {'load s':>8} {'mem MB':>8}")
+        for fmt in formats:
+            path = save_dataset(df, stem, fmt=fmt)
+            size = os.path.getsize(path) / 1e6
+            for label, columns in [('all', None), ('subset', DASHBOARD_COLUMNS)]:
+                seconds, mem = time_load(stem, fmt, columns)
+                print(f"{fmt:<8} {label:<10} {size:>8.2f} {seconds:>8.3f} {mem / 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    run()
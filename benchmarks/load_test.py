@@ -0,0 +1,85 @@
+"""Load test for the local prediction service (src/service.py).
+
+Start the service first:        python -m src.service --port 8080
+Then run from the project root: python -m benchmarks.load_test --port 8080
+
+Reports p50/p99 latency and requests per second for single-row and batched
+requests at the given concurrency.
+"""
+import time
+import json
+import asyncio
+import argparse
+import numpy as np
+
+SAMPLE_ROW = {'hour': 8, 'day_of_week': 1, 'month': 6, 'weather_main': 'Clouds',
+              'weather_description': 'broken clouds', 'temp': 288.0, 'rain_1h': 0.0,
+              'snow_1h': 0.0, 'clouds_all': 75}
+
+
+async def _request(reader, writer, host, body):
+    writer.write(
+        f"POST /predict HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    payload = await reader.readexactly(length)
+    if b" 200 " not in status:
+        raise RuntimeError(payload.decode())
+
+
+async def _client(host, port, body, n_requests, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(n_requests):
+            start = time.perf_counter()
+            await _request(reader, writer, host, body)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def run_scenario(host, port, rows_per_request, concurrency, n_requests):
+    body = json.dumps([SAMPLE_ROW] * rows_per_request if rows_per_request > 1 else SAMPLE_ROW).encode()
+    latencies = []
+    per_client = max(1, n_requests // concurrency)
+    start = time.perf_counter()
+    await asyncio.gather(*[_client(host, port, body, per_client, latencies) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "rows_per_request": rows_per_request,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "requests_per_s": len(latencies) / elapsed,
+        "rows_per_s": len(latencies) * rows_per_request / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+async def main(args):
+    print(f"{'rows/req':>8} {'conc':>5} {'requests':>9} {'req/s':>9} {'rows/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for rows in args.batch_sizes:
+        r = await run_scenario(args.host, args.port, rows, args.concurrency, args.requests)
+        print(f"{r['rows_per_request']:>8} {r['concurrency']:>5} {r['requests']:>9} {r['requests_per_s']:>9.1f} "
+              f"{r['rows_per_s']:>10.1f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,289 @@
+"""End-to-end benchmark suite on synthetic data, with JSON results and regression checks.
+
+Run from the project root:
+    python -m benchmarks.suite run [--sizes 50k 1m 10m] [--variant small] [--save-baseline]
+    python -m benchmarks.suite compare [BASELINE] [CURRENT] [--threshold 0.2]
+
+`run` generates raw files shaped like Metro_Interstate_Traffic_Volume.csv (cached
+in benchmarks/data/ per size and seed) and, for each size in a fresh process, times
+load_and_preprocess, every TrafficMiner training step, the TrafficVisualizer plots and
+batch/single-row inference. Each operation records wall and CPU time, throughput and
+peak RSS (reset before every operation on Linux, so the peak is the operation's own).
+Results go to benchmarks/results/<timestamp>.json.
+
+`compare` flags operations whose time or peak memory grew by more than the threshold
+against a baseline and exits with status 1 if any did, so it can gate CI.
+Everything runs offline on CPU.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import numpy as np
+import pandas as pd
+from src.preprocessing import RAW_DATA_PATH, RAW_DTYPES
+from src.instrumentation import peak_rss_mb
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+BASELINE_PATH = os.path.join(RESULTS_DIR, "baseline.json")
+
+SIZES = {'50k': 50_000, '1m': 1_000_000, '10m': 10_000_000}
+GENERATOR_VERSION = 1
+# Histories longer than this many hours no longer fit hourly timestamps in datetime64[ns]
+# (which end in 2262), so larger sizes sample more densely, like a finer-grained feed
+MAX_HOURLY_ROWS = 1_300_000
+INFERENCE_BATCH_ROWS = 10_000
+SINGLE_ROW_CALLS = 100
+
+
+def synthetic_raw(n_rows, seed=42, source_path=RAW_DATA_PATH):
+    """`n_rows` raw records with the Metro columns, dtypes and value distributions.
+
+    Weather rows are resampled from the Metro data; volume follows its mean
+    (day of week, hour) profile with multiplicative noise and about 0.5% outages.
+    """
+    rng = np.random.default_rng(seed)
+    source = pd.read_csv(source_path, dtype=RAW_DTYPES)
+    source['date_time'] = pd.to_datetime(source['date_time'])
+
+    step_minutes = 60 if n_rows <= MAX_HOURLY_ROWS else max(1, int(60 * MAX_HOURLY_ROWS / n_rows))
+    times = pd.Timestamp("2012-10-02 09:00:00") + pd.to_timedelta(np.arange(n_rows) * step_minutes, unit='min')
+
+    profile = source.groupby([source['date_time'].dt.dayofweek, source['date_time'].dt.hour])['traffic_volume'].mean()
+    profile = profile.reindex(pd.MultiIndex.from_product([range(7), range(24)]), fill_value=source['traffic_volume'].mean())
+    base = profile.to_numpy().reshape(7, 24)[times.dayofweek, times.hour]
+    volume = base * rng.lognormal(0, 0.15, n_rows)
+    volume[rng.random(n_rows) < 0.005] = 0
+
+    weather_cols = ['temp', 'rain_1h', 'snow_1h', 'clouds_all', 'weather_main', 'weather_description']
+    weather = source[weather_cols].iloc[rng.integers(0, len(source), n_rows)].reset_index(drop=True)
+    raw = pd.DataFrame({'holiday': pd.Series(np.nan, index=range(n_rows), dtype='str')})
+    raw = pd.concat([raw, weather], axis=1)
+    raw['date_time'] = times.strftime("%Y-%m-%d %H:%M:%S")
+    raw['traffic_volume'] = np.round(volume).astype(np.int64)
+    return raw[list(source.columns)]
+
+
+def synthetic_raw_path(n_rows, seed=42, data_dir=DATA_DIR):
+    """Path of the cached synthetic raw CSV for (`n_rows`, `seed`), generating it when missing."""
+    path = os.path.join(data_dir, f"synthetic_{n_rows}_s{seed}_v{GENERATOR_VERSION}.csv")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        start = time.perf_counter()
+        synthetic_raw(n_rows, seed).to_csv(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+        print(f"Generated {n_rows:,} synthetic rows in {time.perf_counter() - start:.1f}s: {path}")
+    return path
+
+
+def _reset_peak_rss():
+    """Resets the process's peak RSS (VmHWM); False where that is not supported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class _Recorder:
+    def __init__(self):
+        self.results = {}
+        self.per_operation_peak = True
+
+    def measure(self, name, func, rows=None, calls=1):
+        """Runs `func` `calls` times and records mean wall/CPU time, throughput and peak RSS."""
+        self.per_operation_peak &= _reset_peak_rss()
+        cpu = time.process_time()
+        start = time.perf_counter()
+        for _ in range(calls):
+            result = func()
+        wall_s = (time.perf_counter() - start) / calls
+        cpu_s = (time.process_time() - cpu) / calls
+        if rows is None and isinstance(result, pd.DataFrame):
+            rows = len(result)
+        self.results[name] = {'wall_s': wall_s, 'cpu_s': cpu_s, 'rows': rows,
+                              'rows_per_s': rows / wall_s if rows and wall_s > 0 else None,
+                              'peak_rss_mb': peak_rss_mb()}
+        print(f"  {name:<28} {wall_s:>9.3f}s" + (f" {rows / wall_s:>14,.0f} rows/s" if rows and wall_s > 0 else ""))
+        return result
+
+
+def run_size(raw_path, variant='small', chunksize=None, compact=False):
+    """Times every operation on one raw file; runs in a fresh worker process."""
+    import matplotlib.pyplot as plt
+    from src.preprocessing import load_and_preprocess, stream_preprocess
+    from src.storage import load_dataset
+    from src.mining import TrafficMiner
+    from src.visualization import TrafficVisualizer
+    from src.prediction import TrafficPredictor
+    from src.features import MODEL_FEATURES
+    from src.artifacts import load_artifact
+
+    recorder = _Recorder()
+    work_dir = tempfile.mkdtemp(prefix="bench_suite_")
+    try:
+        stem = os.path.join(work_dir, "processed")
+        encoder_path = os.path.join(work_dir, "weather_encoder.pkl")
+        if chunksize:
+            preprocess = "stream_preprocess"
+            recorder.measure(preprocess, lambda: stream_preprocess(raw_path, stem, encoder_path, chunksize))
+        else:
+            preprocess = "load_and_preprocess"
+            recorder.measure(preprocess, lambda: load_and_preprocess(raw_path, stem, encoder_path))
+
+        miner = TrafficMiner(models_dir=os.path.join(work_dir, "models"), n_jobs=1)
+        miner.df = recorder.measure("load_dataset", lambda: load_dataset(stem, downcast=compact))
+        n_rows = len(miner.df)
+        # Streaming preprocessing returns no frame; its throughput is over the rows written
+        recorder.results[preprocess].update(rows=n_rows, rows_per_s=n_rows / recorder.results[preprocess]['wall_s'])
+        if compact:
+            recorder.measure("compact", miner.compact, n_rows)
+        recorder.measure("train_clustering", miner.train_clustering, n_rows)
+        recorder.measure("detect_anomalies", miner.detect_anomalies, n_rows)
+        recorder.measure("train_prediction_model", lambda: miner.train_prediction_model(variant=variant), n_rows)
+
+        viz = TrafficVisualizer(df=miner.df)
+        for plot in ['plot_hourly_traffic', 'plot_weather_impact', 'plot_correlation', 'plot_anomalies',
+                     'plot_cluster_segments']:
+            recorder.measure(plot, getattr(viz, plot), n_rows)
+            plt.close('all')
+
+        predictor = TrafficPredictor(model=miner.rf_model, encoders=load_artifact(encoder_path))
+        batch = predictor.feature_matrix(miner.df[MODEL_FEATURES].iloc[:INFERENCE_BATCH_ROWS])
+        recorder.measure("predict_batch", lambda: predictor.predict(batch), len(batch))
+        recorder.measure("predict_single_row", lambda: predictor.predict(batch[:1]), 1, calls=SINGLE_ROW_CALLS)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {'rows': n_rows, 'per_operation_peak': recorder.per_operation_peak, 'operations': recorder.results}
+
+
+def environment():
+    import sklearn
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=BENCH_DIR, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'sklearn': sklearn.__version__, 'commit': commit}
+
+
+def run(sizes, variant='small', seed=42, chunksize=None, compact=False, output=None, save_baseline=False):
+    """Runs the suite for each size label and writes the JSON results; returns them."""
+    results = {'created': datetime.now().isoformat(timespec='seconds'), 'environment': environment(),
+               'params': {'variant': variant, 'seed': seed, 'chunksize': chunksize, 'compact': compact}, 'sizes': {}}
+    for label in sizes:
+        raw_path = synthetic_raw_path(SIZES[label], seed)
+        print(f"\n[{label}] {SIZES[label]:,} rows")
+        # A fresh process per size keeps peak memory and import state independent
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            try:
+                results['sizes'][label] = pool.submit(run_size, raw_path, variant, chunksize, compact).result()
+            except Exception as e:  # including a worker killed for memory
+                results['sizes'][label] = {'error': f"{type(e).__name__}: {e}"}
+                print(f"  failed: {results['sizes'][label]['error']}")
+
+    output = output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    paths = [output] + ([BASELINE_PATH] if save_baseline else [])
+    for path in paths:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+    print(f"\nResults written to {', '.join(paths)}")
+    return results
+
+
+def compare(baseline, current, threshold=0.2, min_seconds=0.05, memory_threshold=0.2, min_mb=20):
+    """Per-operation change between two result dicts; returns (frame, regressed).
+
+    A time or memory increase counts as a regression only when it exceeds both the
+    relative threshold and the absolute floor, so sub-noise timings do not fail the gate.
+    Only sizes present in both runs are compared; a baseline size the current run did
+    not cover is listed as 'not run' without failing, while an operation absent from a
+    size that did run is 'missing' and counts as a regression.
+    """
+    rows = []
+    for label, base_size in baseline['sizes'].items():
+        if label not in current['sizes']:
+            rows.append({'size': label, 'status': 'not run'})
+            continue
+        current_ops = current['sizes'][label].get('operations')
+        for op, base in base_size.get('operations', {}).items():
+            new = (current_ops or {}).get(op)
+            if new is None:
+                rows.append({'size': label, 'operation': op, 'status': 'missing'})
+                continue
+            time_ratio = new['wall_s'] / base['wall_s'] if base['wall_s'] else np.nan
+            slower = time_ratio > 1 + threshold and new['wall_s'] - base['wall_s'] > min_seconds
+            bigger = False
+            if base.get('peak_rss_mb') and new.get('peak_rss_mb'):
+                bigger = (new['peak_rss_mb'] > base['peak_rss_mb'] * (1 + memory_threshold)
+                          and new['peak_rss_mb'] - base['peak_rss_mb'] > min_mb)
+            faster = time_ratio < 1 - threshold and base['wall_s'] - new['wall_s'] > min_seconds
+            rows.append({'size': label, 'operation': op, 'base_s': base['wall_s'], 'current_s': new['wall_s'],
+                         'time_ratio': time_ratio, 'base_peak_mb': base.get('peak_rss_mb'),
+                         'current_peak_mb': new.get('peak_rss_mb'),
+                         'status': 'SLOWER' if slower else 'MORE MEMORY' if bigger else 'faster' if faster else 'ok'})
+    frame = pd.DataFrame(rows)
+    regressed = bool(len(frame)) and frame['status'].isin(['SLOWER', 'MORE MEMORY', 'missing']).any()
+    return frame, regressed
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def latest_results(results_dir=RESULTS_DIR):
+    paths = sorted(p for p in glob.glob(os.path.join(results_dir, "*.json")) if os.path.abspath(p) != BASELINE_PATH)
+    return paths[-1] if paths else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="Run the suite and write JSON results.")
+    run_parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=['50k', '1m'],
+                            help="Dataset sizes (10m needs several GB of RAM; combine with --chunksize/--compact).")
+    run_parser.add_argument("--variant", default="small", help="Regressor variant (see mining.MODEL_VARIANTS).")
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--chunksize", type=int, default=None, help="Time streaming preprocessing instead.")
+    run_parser.add_argument("--compact", action="store_true", help="Mine on downcast data and the float32 matrix.")
+    run_parser.add_argument("-o", "--output", help="Results path (default: benchmarks/results/<timestamp>.json).")
+    run_parser.add_argument("--save-baseline", action="store_true", help=f"Also write the results to {BASELINE_PATH}.")
+    compare_parser = commands.add_parser("compare", help="Flag regressions against a baseline.")
+    compare_parser.add_argument("baseline", nargs="?", default=BASELINE_PATH)
+    compare_parser.add_argument("current", nargs="?", default=None, help="Default: the latest results file.")
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative slowdown.")
+    compare_parser.add_argument("--min-seconds", type=float, default=0.05, help="Ignore slowdowns below this.")
+    compare_parser.add_argument("--memory-threshold", type=float, default=0.2, help="Allowed relative peak RSS growth.")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run(args.sizes, args.variant, args.seed, args.chunksize, args.compact, args.output, args.save_baseline)
+    else:
+        current_path = args.current or latest_results()
+        if not os.path.exists(args.baseline) or current_path is None:
+            print("Need a baseline and a results file: run `python -m benchmarks.suite run --save-baseline` first.")
+            sys.exit(2)
+        frame, regressed = compare(_load(args.baseline), _load(current_path), args.threshold, args.min_seconds,
+                                   args.memory_threshold)
+        print(f"Baseline: {args.baseline}\nCurrent:  {current_path}\n")
+        print(frame.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+        print("\nREGRESSION" if regressed else "\nNo regressions")
+        sys.exit(1 if regressed else 0)
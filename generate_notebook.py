@@ -26,13 +26,16 @@ notebook_content = {
     "import seaborn as sns\n",
     "import os\n",
     "\n",
-    "# Load Processed Data\n",
-    "DATA_PATH = os.path.join(\"..\", \"data\", \"processed\", \"traffic_processed.csv\")\n",
-    "if not os.path.exists(DATA_PATH):\n",
-    "    print(\"Data not found! Please run preprocessing.py first.\")\n",
+    "# Load Processed Data (Parquet if available, CSV fallback)\n",
+    "DATA_STEM = os.path.join(\"..\", \"data\", \"processed\", \"traffic_processed\")\n",
+    "if os.path.exists(DATA_STEM + \".parquet\"):\n",
+    "    df = pd.read_parquet(DATA_STEM + \".parquet\")\n",
+    "elif os.path.exists(DATA_STEM + \".csv\"):\n",
+    "    df = pd.read_csv(DATA_STEM + \".csv\", parse_dates=['date_time'])\n",
     "else:\n",
-    "    df = pd.read_csv(DATA_PATH)\n",
-    "    df['date_time'] = pd.to_datetime(df['date_time'])\n",
+    "    df = None\n",
+    "    print(\"Data not found! Please run preprocessing.py first.\")\n",
+    "if df is not None:\n",
     "    print(\"Data Loaded Successfully. Shape:\", df.shape)\n",
     "    display(df.head())"
    ]
@@ -0,0 +1,182 @@
+"""Precomputed aggregate cube for the visualizer and dashboard.
+
+`TrafficCube` holds per-cell count, sum, sum of squares, min/max and anomaly
+count of `traffic_volume`, keyed by CUBE_DIMENSIONS, plus fixed-width volume
+histograms per (year, weather_description) as mergeable quantile sketches. Both
+are bounded by the number of distinct keys, not by the number of raw rows, so
+plots render in constant time from them.
+
+The cube is built after mining and stamped with a data version (content hash
+of the enhanced dataset plus the cube layout) in the manifest; a cube whose
+version no longer matches the data is treated as missing.
+
+Run from the project root:  python -m src.aggregates [--force]
+"""
+import os
+import json
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from src.storage import PROCESSED_DATA_PATH, ENHANCED_STEM, load_dataset, save_dataset, dataset_path
+from src.manifest import MANIFEST_PATH, load_manifest, save_manifest, file_hash, stage_is_current, record_stage
+
+CUBE_STEM = os.path.join(PROCESSED_DATA_PATH, "traffic_cube")
+SKETCH_STEM = os.path.join(PROCESSED_DATA_PATH, "traffic_volume_sketch")
+CUBE_DIMENSIONS = ['year', 'month', 'day_of_week', 'hour', 'weather_main']
+SKETCH_DIMENSIONS = ['year', 'weather_description']
+SKETCH_BIN_WIDTH = 25
+
+
+def data_version(stem=ENHANCED_STEM, manifest=None):
+    """Version of the data a cube is built from (None if the dataset is missing)."""
+    path = dataset_path(stem)
+    if not os.path.exists(path):
+        return None
+    layout = {'dimensions': CUBE_DIMENSIONS, 'sketch': SKETCH_DIMENSIONS, 'bin_width': SKETCH_BIN_WIDTH}
+    digest = hashlib.sha256(file_hash(path, manifest).encode())
+    digest.update(json.dumps(layout, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def _years_mask(frame, years):
+    return frame['year'].isin([int(y) for y in years]) if years else slice(None)
+
+
+def _sketch_quantile(lower_edges, counts, q):
+    """Quantile of a fixed-width histogram, interpolating linearly inside the bin."""
+    cumulative = np.cumsum(counts)
+    target = q * cumulative[-1]
+    i = min(np.searchsorted(cumulative, target), len(counts) - 1)
+    before = cumulative[i - 1] if i > 0 else 0
+    return lower_edges[i] + SKETCH_BIN_WIDTH * (target - before) / counts[i]
+
+
+class TrafficCube:
+    """Aggregate cells and volume sketches; the query methods mirror src.queries."""
+
+    def __init__(self, cells, sketch, version=None):
+        self.cells = cells
+        self.sketch = sketch
+        self.version = version
+
+    @classmethod
+    def build(cls, df, version=None):
+        """Aggregates raw rows (traffic_volume, is_anomaly and the dimension columns)."""
+        volume = df['traffic_volume'].astype(np.float64)
+        frame = df[CUBE_DIMENSIONS].assign(
+            volume=volume, volume_sq=volume ** 2, anomaly=df['is_anomaly'].astype(np.int64))
+        cells = frame.groupby(CUBE_DIMENSIONS, observed=True).agg(
+            records=('volume', 'size'), volume_sum=('volume', 'sum'), volume_sq_sum=('volume_sq', 'sum'),
+            volume_min=('volume', 'min'), volume_max=('volume', 'max'), anomalies=('anomaly', 'sum'),
+        ).reset_index()
+
+        bins = (df['traffic_volume'] // SKETCH_BIN_WIDTH).astype(np.int32).rename('volume_bin')
+        sketch = (df[SKETCH_DIMENSIONS].join(bins)
+                  .groupby(SKETCH_DIMENSIONS + ['volume_bin'], observed=True).size()
+                  .rename('records').reset_index())
+        return cls(cells, sketch, version)
+
+    def save(self, cube_stem=CUBE_STEM, sketch_stem=SKETCH_STEM):
+        save_dataset(self.cells, cube_stem)
+        save_dataset(self.sketch, sketch_stem)
+
+    @classmethod
+    def load(cls, cube_stem=CUBE_STEM, sketch_stem=SKETCH_STEM, source_stem=ENHANCED_STEM, manifest_path=MANIFEST_PATH):
+        """Loads the cube if it was built from the current data; returns None when missing or stale."""
+        manifest = load_manifest(manifest_path)
+        version = data_version(source_stem, manifest)
+        if version is None or not stage_is_current(manifest, "aggregate", version):
+            return None
+        cells, sketch = load_dataset(cube_stem), load_dataset(sketch_stem)
+        if cells is None or sketch is None:
+            return None
+        return cls(cells, sketch, version)
+
+    def rollup(self, by, years=None):
+        """Count, mean, std and anomaly count of traffic_volume per `by` group."""
+        cells = self.cells[_years_mask(self.cells, years)]
+        grouped = cells.groupby(by, observed=True)[['records', 'volume_sum', 'volume_sq_sum', 'anomalies']].sum()
+        n = grouped['records']
+        mean = grouped['volume_sum'] / n
+        variance = (grouped['volume_sq_sum'] - n * mean ** 2) / (n - 1)
+        return pd.DataFrame({'records': n, 'traffic_volume': mean,
+                             'volume_std': np.sqrt(variance.clip(lower=0)),
+                             'anomalies': grouped['anomalies']}).reset_index()
+
+    def years(self):
+        return sorted(int(y) for y in self.cells['year'].unique())
+
+    def summary(self, years=None):
+        """One-row frame: records, avg_volume, anomalies."""
+        cells = self.cells[_years_mask(self.cells, years)]
+        records = int(cells['records'].sum())
+        avg_volume = cells['volume_sum'].sum() / records if records else np.nan
+        return pd.DataFrame([{'records': records, 'avg_volume': avg_volume, 'anomalies': int(cells['anomalies'].sum())}])
+
+    def hourly_by_weekday(self, years=None):
+        """Columns hour, day_of_week, traffic_volume (mean), records."""
+        rolled = self.rollup(['hour', 'day_of_week'], years)
+        return rolled[['hour', 'day_of_week', 'traffic_volume', 'records']].sort_values(['day_of_week', 'hour'], ignore_index=True)
+
+    def anomaly_counts_by_year(self, years=None):
+        """Columns year, records, anomalies."""
+        return self.rollup(['year'], years)[['year', 'records', 'anomalies']]
+
+    def weather_box_stats(self, years=None, top_n=10):
+        """Box plot statistics for the `top_n` most frequent weather descriptions, from the sketches.
+
+        Same columns as queries.weather_box_stats; quantiles are accurate to within one
+        SKETCH_BIN_WIDTH.
+        """
+        sketch = self.sketch[_years_mask(self.sketch, years)]
+        merged = sketch.groupby(['weather_description', 'volume_bin'], observed=True)['records'].sum().reset_index()
+        totals = merged.groupby('weather_description', observed=True)['records'].sum()
+        totals = totals[totals > 0].reset_index()
+        top = totals.sort_values(['records', 'weather_description'], ascending=[False, True]).head(top_n)
+
+        rows = []
+        for description, records in top.itertuples(index=False):
+            hist = merged[merged['weather_description'] == description].sort_values('volume_bin')
+            edges = hist['volume_bin'].to_numpy(dtype=np.float64) * SKETCH_BIN_WIDTH
+            counts = hist['records'].to_numpy(dtype=np.float64)
+            q1, median, q3 = (_sketch_quantile(edges, counts, q) for q in (0.25, 0.5, 0.75))
+            lo, hi = edges[0], edges[-1] + SKETCH_BIN_WIDTH
+            rows.append({'weather_description': description, 'records': int(records),
+                         'q1': q1, 'median': median, 'q3': q3,
+                         'whislo': max(lo, q1 - 1.5 * (q3 - q1)), 'whishi': min(hi, q3 + 1.5 * (q3 - q1))})
+        return pd.DataFrame(rows, columns=['weather_description', 'records', 'q1', 'median', 'q3', 'whislo', 'whishi'])
+
+
+def build_cube(source_stem=ENHANCED_STEM, cube_stem=CUBE_STEM, sketch_stem=SKETCH_STEM, force=False, manifest=None):
+    """Builds and saves the cube unless it is current for the data; returns the TrafficCube (None without data)."""
+    own_manifest = manifest is None
+    if own_manifest:
+        manifest = load_manifest()
+    version = data_version(source_stem, manifest)
+    if version is None:
+        print("Enhanced data not found. Run mining first.")
+        return None
+
+    cube = None
+    if not force and stage_is_current(manifest, "aggregate", version):
+        cells, sketch = load_dataset(cube_stem), load_dataset(sketch_stem)
+        if cells is not None and sketch is not None:
+            print("Aggregate cube is current; skipping rebuild.")
+            cube = TrafficCube(cells, sketch, version)
+    if cube is None:
+        columns = list(dict.fromkeys(CUBE_DIMENSIONS + SKETCH_DIMENSIONS + ['traffic_volume', 'is_anomaly']))
+        cube = TrafficCube.build(load_dataset(source_stem, columns=columns), version)
+        cube.save(cube_stem, sketch_stem)
+        record_stage(manifest, "aggregate", version)
+        print(f"Aggregate cube saved: {len(cube.cells):,} cells, {len(cube.sketch):,} sketch bins.")
+    if own_manifest:
+        save_manifest(manifest)
+    return cube
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the precomputed aggregate cube for the dashboard.")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the cube matches the current data.")
+    args = parser.parse_args()
+    build_cube(force=args.force)
@@ -0,0 +1,24 @@
+import os
+import warnings
+import joblib
+
+
+def save_artifact(obj, path, compress=0):
+    """Dumps a model artifact with joblib.
+
+    Uncompressed artifacts (compress=0) can be memory-mapped on load; compression
+    (e.g. 3, or ('lz4', 3) when lz4 is installed) trades load time for file size.
+    """
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    joblib.dump(obj, path, compress=compress)
+    return path
+
+
+def load_artifact(path, mmap=True):
+    """Loads an artifact, memory-mapping its large arrays when the file is uncompressed."""
+    with warnings.catch_warnings():
+        # joblib ignores mmap_mode for compressed files and warns about it
+        warnings.filterwarnings("ignore", message=".*mmap_mode.*compressed.*")
+        return joblib.load(path, mmap_mode='r' if mmap else None)
@@ -0,0 +1,54 @@
+"""Single entry point for the pipeline's command-line tools.
+
+    python -m src.cli ingest [--source DIR]        # src.data_loader
+    python -m src.cli preprocess [--chunksize N]   # src.preprocessing
+    python -m src.cli mine [--variant small]       # src.mining
+    python -m src.cli predict [--grid]             # src.prediction
+    python -m src.cli bench run --sizes 50k        # benchmarks.suite
+    python -m src.cli bench inference              # benchmarks.bench_inference (any bench_<name>)
+
+Each command hands its remaining arguments to the module's own command line, so
+`python -m src.cli mine --force` behaves exactly like `python -m src.mining --force`.
+This module imports only the standard library; pandas, scikit-learn and matplotlib
+load inside the command that needs them, and nothing is written until a command
+runs. `python -m benchmarks.bench_startup` measures each command's cold start.
+"""
+import sys
+import runpy
+import argparse
+import importlib.util
+
+COMMANDS = {
+    'ingest': ('src.data_loader', "Fetch the raw dataset, or ingest new raw files incrementally."),
+    'preprocess': ('src.preprocessing', "Clean and feature-engineer the raw data."),
+    'mine': ('src.mining', "Train the clustering, anomaly and regression models."),
+    'predict': ('src.prediction', "Score a file of scenarios or the built-in hour/day grid."),
+    'bench': ('benchmarks.suite', "Run the benchmark suite, or a focused benchmark by name."),
+}
+
+
+def resolve(command, args):
+    """(module, argv) that `command` runs; `bench <name>` selects benchmarks/bench_<name>.py."""
+    module = COMMANDS[command][0]
+    if command == 'bench' and args and not args[0].startswith('-'):
+        name = f"benchmarks.bench_{args[0]}"
+        if importlib.util.find_spec(name) is not None:
+            return name, args[1:]
+    return module, args
+
+
+def main(argv=None):
+    epilog = "commands:\n" + "\n".join(f"  {name:<12}{summary}" for name, (_, summary) in COMMANDS.items())
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description=__doc__, epilog=epilog,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=list(COMMANDS), metavar="command", help="One of the commands below.")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments for the command (see `<command> --help`).")
+    args = parser.parse_args(argv)
+
+    module, module_args = resolve(args.command, args.args)
+    sys.argv = [module] + module_args # run_module replaces argv[0] with the module's path
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import os
+import numpy as np
+from joblib import Parallel, delayed
+from src.artifacts import save_artifact, load_artifact
+
+CLUSTER_FEATURES = ['traffic_volume', 'hour', 'day_of_week']
+MODELS_DIR = os.path.join("data", "models")
+KMEANS_PATH = os.path.join(MODELS_DIR, "kmeans_traffic.pkl")
+SCALER_PATH = os.path.join(MODELS_DIR, "kmeans_scaler.pkl")
+
+
+def _chunks(X, chunk_size):
+    for start in range(0, len(X), chunk_size):
+        yield X[start:start + chunk_size]
+
+
+class ScalableClusterer:
+    """MiniBatchKMeans over standardized features, trained chunk by chunk.
+
+    The scaler is fitted once (also in chunks) and then frozen, so later
+    `partial_fit` calls move the centroids within a fixed feature space.
+    """
+
+    def __init__(self, n_clusters=4, chunk_size=100_000, random_state=42):
+        from sklearn.cluster import MiniBatchKMeans
+        from sklearn.preprocessing import StandardScaler
+
+        self.n_clusters = n_clusters
+        self.chunk_size = chunk_size
+        self.scaler = StandardScaler()
+        self.batch_size = 4096
+        self.model = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, batch_size=self.batch_size, n_init=3)
+
+    @staticmethod
+    def features(df):
+        return df[CLUSTER_FEATURES].to_numpy(dtype=np.float32)
+
+    def fit(self, X):
+        """Fits scaler and clusters on an array (or DataFrame) with CLUSTER_FEATURES columns."""
+        X = self.features(X) if hasattr(X, 'columns') else X
+        for chunk in _chunks(X, self.chunk_size):
+            self.scaler.partial_fit(chunk)
+        self._update(X)
+        return self
+
+    def _update(self, X):
+        # One scaled chunk in memory at a time, fed to the model in mini-batches
+        for chunk in _chunks(X, self.chunk_size):
+            for batch in _chunks(self.scaler.transform(chunk), self.batch_size):
+                self.model.partial_fit(batch)
+
+    def partial_fit(self, X):
+        """Updates the clusters with new data without retraining from scratch."""
+        X = self.features(X) if hasattr(X, 'columns') else X
+        if not hasattr(self.scaler, 'mean_'):
+            return self.fit(X)
+        self._update(X)
+        return self
+
+    def predict(self, X):
+        X = self.features(X) if hasattr(X, 'columns') else X
+        return np.concatenate([self.model.predict(self.scaler.transform(chunk)) for chunk in _chunks(X, self.chunk_size)])
+
+    def save(self, model_path=KMEANS_PATH, scaler_path=SCALER_PATH):
+        save_artifact(self.model, model_path)
+        save_artifact(self.scaler, scaler_path)
+
+    @classmethod
+    def load(cls, model_path=KMEANS_PATH, scaler_path=SCALER_PATH, chunk_size=100_000):
+        """Loads a saved minibatch clusterer; ValueError if the saved model came from the kmeans engine."""
+        clusterer = cls(chunk_size=chunk_size)
+        model = load_artifact(model_path, mmap=False)
+        if type(model).__name__ != 'MiniBatchKMeans':
+            # Full KMeans is fitted on raw features, so no scaler belongs to it
+            raise ValueError(f"{model_path} holds a {type(model).__name__} model; retrain with the minibatch engine")
+        clusterer.model = model
+        clusterer.scaler = load_artifact(scaler_path, mmap=False)
+        clusterer.n_clusters = clusterer.model.n_clusters
+        return clusterer
+
+
+def _evaluate_k(X_scaled, k, sample_size, random_state):
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.metrics import silhouette_score
+
+    model = MiniBatchKMeans(n_clusters=k, random_state=random_state, batch_size=4096, n_init=3).fit(X_scaled)
+    labels = model.predict(X_scaled)
+    silhouette = silhouette_score(X_scaled, labels, sample_size=min(sample_size, len(X_scaled)), random_state=random_state)
+    return {'k': k, 'inertia': float(model.inertia_), 'silhouette': float(silhouette)}
+
+
+def select_n_clusters(df, k_range=range(2, 9), n_jobs=-1, sample_size=10_000, max_rows=500_000, random_state=42):
+    """Scores each k in parallel (inertia, sampled silhouette) and returns (best_k, results).
+
+    Large inputs are subsampled to `max_rows` for the search.
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    X = ScalableClusterer.features(df)
+    if len(X) > max_rows:
+        X = X[np.random.default_rng(random_state).choice(len(X), max_rows, replace=False)]
+    X_scaled = StandardScaler().fit_transform(X)
+    results = Parallel(n_jobs=n_jobs)(delayed(_evaluate_k)(X_scaled, k, sample_size, random_state) for k in k_range)
+    best = max(results, key=lambda r: r['silhouette'])
+    return best['k'], results
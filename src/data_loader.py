@@ -1,8 +1,13 @@
 import os
+import glob
+import argparse
 import urllib.request
 import gzip
 import shutil
 import pandas as pd
+from src.manifest import load_manifest, save_manifest, file_hash, inputs_hash, record_stage
+from src.storage import PROCESSED_STEM, load_dataset
+from src.preprocessing import RAW_DTYPES, load_and_preprocess, preprocess_increment
 
 RAW_DATA_PATH = os.path.join("data", "raw")
 PROCESSED_DATA_PATH = os.path.join("data", "processed")
@@ -11,15 +16,18 @@ COMPRESSED_FILE = os.path.join(RAW_DATA_PATH, "Metro_Interstate_Traffic_Volume.c
 CSV_FILE = os.path.join(RAW_DATA_PATH, "Metro_Interstate_Traffic_Volume.csv")
 
 def download_data():
-    """Downloads the dataset from UCI Archive if it doesn't exist."""
+    """Downloads the dataset from UCI Archive if it doesn't exist.
+
+    The archive is only extracted again when its content hash has changed.
+    """
     if not os.path.exists(RAW_DATA_PATH):
         os.makedirs(RAW_DATA_PATH)
-    
-    if os.path.exists(CSV_FILE):
-        print(f"Dataset already exists at {CSV_FILE}")
-        return
 
     if not os.path.exists(COMPRESSED_FILE):
+        if os.path.exists(CSV_FILE):
+            print(f"Dataset already exists at {CSV_FILE}")
+            return
+
         print(f"Downloading dataset from {DATASET_URL}...")
         try:
             urllib.request.urlretrieve(DATASET_URL, COMPRESSED_FILE)
@@ -28,14 +36,91 @@ def download_data():
             print(f"Error downloading data: {e}")
             return
 
+    manifest = load_manifest()
+    archive_sha = file_hash(COMPRESSED_FILE, manifest)
+    if os.path.exists(CSV_FILE) and manifest["stages"].get("extract") == archive_sha:
+        print(f"Dataset already exists at {CSV_FILE} (archive unchanged)")
+        save_manifest(manifest)
+        return
+
     print("Extracting dataset...")
     try:
         with gzip.open(COMPRESSED_FILE, 'rb') as f_in:
             with open(CSV_FILE, 'wb') as f_out:
                 shutil.copyfileobj(f_in, f_out)
+        record_stage(manifest, "extract", archive_sha)
+        save_manifest(manifest)
         print(f"Extracted to {CSV_FILE}")
     except Exception as e:
         print(f"Error extracting data: {e}")
 
+
+def processed_watermark():
+    """Latest `date_time` in the processed store (reads only that column).
+
+    Always read from the store rather than cached, so it stays correct after full
+    rebuilds by src.preprocessing or src.pipeline.
+    """
+    processed = load_dataset(PROCESSED_STEM, columns=['date_time'])
+    if processed is None or not len(processed):
+        return None
+    return processed['date_time'].max()
+
+
+def ingest_directory(source_dir):
+    """Incrementally ingests new raw CSV files dropped into `source_dir`.
+
+    Files already seen (by content hash) are skipped. Rows newer than the watermark are
+    appended to the raw CSV, preprocessed and appended to the processed store; the
+    manifest keeps the stage keys in sync so unchanged stages are skipped later.
+    Returns the number of processed rows appended.
+    """
+    manifest = load_manifest()
+    seen = set(manifest.setdefault("ingested", []))
+    new_files = []
+    for path in sorted(glob.glob(os.path.join(source_dir, "*.csv"))):
+        sha = file_hash(path, manifest)
+        if sha not in seen:
+            new_files.append((path, sha))
+
+    if not new_files:
+        print("No new source files.")
+        save_manifest(manifest)
+        return 0
+
+    raw_columns = list(pd.read_csv(CSV_FILE, nrows=0).columns)
+    new_raw = pd.concat([pd.read_csv(path, dtype=RAW_DTYPES)[raw_columns] for path, _ in new_files], ignore_index=True)
+    watermark = processed_watermark()
+    if watermark is not None:
+        new_raw = new_raw[pd.to_datetime(new_raw['date_time']) > watermark]
+    print(f"{len(new_files)} new file(s), {len(new_raw):,} rows after watermark {watermark}")
+
+    # Keep the raw history complete so a full rebuild stays possible
+    if len(new_raw):
+        new_raw.to_csv(CSV_FILE, mode='a', header=False, index=False)
+
+    try:
+        appended = preprocess_increment(new_raw, watermark) if len(new_raw) else new_raw
+        rows = len(appended)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Incremental preprocessing not possible ({e}); rebuilding.")
+        rebuilt = load_and_preprocess()
+        rows = len(rebuilt) if rebuilt is not None else 0
+
+    manifest["ingested"] = sorted(seen | {sha for _, sha in new_files})
+    # Raw and processed files changed together; mark preprocessing as current for them
+    record_stage(manifest, "preprocess", inputs_hash([CSV_FILE], manifest=manifest))
+    save_manifest(manifest)
+    print(f"Processed store updated ({rows:,} rows written).")
+    return rows
+
+
 if __name__ == "__main__":
-    download_data()
+    parser = argparse.ArgumentParser(description="Fetch raw traffic data.")
+    parser.add_argument("--source", default=None,
+                        help="Directory of new raw CSV files to ingest incrementally.")
+    args = parser.parse_args()
+    if args.source:
+        ingest_directory(args.source)
+    else:
+        download_data()
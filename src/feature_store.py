@@ -0,0 +1,182 @@
+"""Time-aware traffic features: lags, rolling statistics and EWMA of `traffic_volume`.
+
+All features at hour t use only observations strictly before t. Lags and rolling
+windows are defined in clock hours, so gaps in the hourly series yield missing
+lags and windows with fewer observations rather than shifted ones.
+"""
+import math
+import argparse
+from collections import deque
+import numpy as np
+import pandas as pd
+from src.features import MODEL_FEATURES
+from src.storage import PROCESSED_STEM, load_dataset
+
+LAGS = (1, 24, 168)
+WINDOWS = (24, 168)
+EWM_SPAN = 24
+
+LAG_FEATURES = ([f'lag_{k}h' for k in LAGS]
+                + [f'roll_{stat}_{w}h' for w in WINDOWS for stat in ('mean', 'std')]
+                + [f'ewm_{EWM_SPAN}h'])
+
+
+def compute_lag_features(df, target='traffic_volume'):
+    """Vectorized O(n) computation of LAG_FEATURES for a frame sorted by unique `date_time`."""
+    series = pd.Series(df[target].to_numpy(dtype=np.float64), index=pd.DatetimeIndex(df['date_time']))
+    grid = series.asfreq('h') # one slot per clock hour; gaps become NaN
+    past = grid.shift(1)
+
+    features = pd.DataFrame(index=grid.index)
+    for k in LAGS:
+        features[f'lag_{k}h'] = grid.shift(k)
+    for w in WINDOWS:
+        window = past.rolling(w, min_periods=1)
+        features[f'roll_mean_{w}h'] = window.mean()
+        features[f'roll_std_{w}h'] = window.std()
+    features[f'ewm_{EWM_SPAN}h'] = past.ewm(span=EWM_SPAN, adjust=False, ignore_na=True).mean()
+
+    features = features.reindex(series.index)
+    features.index = df.index
+    return features
+
+
+def add_lag_features(df, target='traffic_volume'):
+    return pd.concat([df, compute_lag_features(df, target)], axis=1)
+
+
+class _WindowStats:
+    """Running count/sum/sum of squares over the last `hours` clock hours."""
+
+    def __init__(self, hours):
+        self.span = pd.Timedelta(hours=hours)
+        self.items = deque()
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def push(self, timestamp, value):
+        self.items.append((timestamp, value))
+        self.count += 1
+        self.total += value
+        self.total_sq += value * value
+
+    def evict_before(self, start):
+        while self.items and self.items[0][0] < start:
+            _, value = self.items.popleft()
+            self.count -= 1
+            self.total -= value
+            self.total_sq -= value * value
+
+    def mean(self):
+        return self.total / self.count if self.count else math.nan
+
+    def std(self):
+        if self.count < 2:
+            return math.nan
+        variance = (self.total_sq - self.total * self.total / self.count) / (self.count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+
+class TrafficFeatureStore:
+    """Incremental version of `compute_lag_features`.
+
+    After `fit` on the history, each new hour costs O(1): call `features_for(t)`
+    to get the features of hour t, then `update(t, volume)` once it is observed.
+    """
+
+    def __init__(self):
+        self.windows = {w: _WindowStats(w) for w in WINDOWS}
+        self.values = {}
+        self._order = deque()
+        self.retention = pd.Timedelta(hours=max(max(LAGS), max(WINDOWS)))
+        self.alpha = 2.0 / (EWM_SPAN + 1)
+        self.ewm = math.nan
+        self.last_timestamp = None
+
+    def fit(self, df, target='traffic_volume'):
+        """Computes batch features for the history and keeps the state needed to continue."""
+        features = compute_lag_features(df, target)
+        tail_start = df['date_time'].iloc[-1] - self.retention
+        tail = df[df['date_time'] >= tail_start]
+        for timestamp, value in zip(tail['date_time'], tail[target]):
+            self._store(timestamp, float(value))
+        ewm = pd.Series(df[target].to_numpy(dtype=np.float64)).ewm(span=EWM_SPAN, adjust=False).mean()
+        self.ewm = float(ewm.iloc[-1]) if len(ewm) else math.nan
+        return features
+
+    def _store(self, timestamp, value):
+        timestamp = pd.Timestamp(timestamp)
+        if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            raise ValueError(f"Observations must arrive in time order ({timestamp} <= {self.last_timestamp})")
+        self.values[timestamp] = value
+        self._order.append(timestamp)
+        for stats in self.windows.values():
+            stats.push(timestamp, value)
+        self.last_timestamp = timestamp
+        # Drop values older than the longest lag/window
+        cutoff = timestamp - self.retention
+        while self._order[0] < cutoff:
+            del self.values[self._order.popleft()]
+
+    def update(self, timestamp, value):
+        """Adds the observed volume for `timestamp`."""
+        value = float(value)
+        self._store(timestamp, value)
+        self.ewm = value if math.isnan(self.ewm) else self.alpha * value + (1 - self.alpha) * self.ewm
+
+    def features_for(self, timestamp):
+        """Features for hour `timestamp` from the observations seen so far."""
+        timestamp = pd.Timestamp(timestamp)
+        row = {}
+        for k in LAGS:
+            row[f'lag_{k}h'] = self.values.get(timestamp - pd.Timedelta(hours=k), math.nan)
+        for w, stats in self.windows.items():
+            stats.evict_before(timestamp - stats.span)
+            row[f'roll_mean_{w}h'] = stats.mean()
+            row[f'roll_std_{w}h'] = stats.std()
+        row[f'ewm_{EWM_SPAN}h'] = self.ewm
+        return row
+
+
+def time_split(df, test_size=0.2):
+    """Splits a time-sorted frame into the earliest (1 - test_size) and the latest rows."""
+    cut = int(len(df) * (1 - test_size))
+    return df.iloc[:cut], df.iloc[cut:]
+
+
+def rolling_origin_evaluate(df, feature_cols, target='traffic_volume', n_splits=5, model_factory=None):
+    """Rolling-origin (expanding window) evaluation on a time-sorted frame."""
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.metrics import mean_absolute_error, r2_score
+    from sklearn.model_selection import TimeSeriesSplit
+
+    model_factory = model_factory or (lambda: RandomForestRegressor(n_estimators=50, random_state=42, n_jobs=-1))
+    X = df[feature_cols]
+    y = df[target]
+    rows = []
+    for fold, (train_idx, test_idx) in enumerate(TimeSeriesSplit(n_splits=n_splits).split(X)):
+        model = model_factory()
+        model.fit(X.iloc[train_idx], y.iloc[train_idx])
+        y_pred = model.predict(X.iloc[test_idx])
+        rows.append({
+            'fold': fold, 'train_rows': len(train_idx), 'test_start': df['date_time'].iloc[test_idx[0]],
+            'MAE': mean_absolute_error(y.iloc[test_idx], y_pred), 'R2': r2_score(y.iloc[test_idx], y_pred),
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate calendar/weather vs lag features with rolling-origin CV.")
+    parser.add_argument("--splits", type=int, default=5)
+    args = parser.parse_args()
+
+    df = load_dataset(PROCESSED_STEM)
+    if df is None:
+        print("Processed data not found. Run preprocessing first.")
+    else:
+        df = add_lag_features(df)
+        for name, cols in [('base', MODEL_FEATURES), ('base+lags', MODEL_FEATURES + LAG_FEATURES)]:
+            report = rolling_origin_evaluate(df, cols, n_splits=args.splits)
+            print(f"\n{name}: mean MAE {report['MAE'].mean():.1f}, mean R2 {report['R2'].mean():.3f}")
+            print(report.to_string(index=False))
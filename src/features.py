@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+TIME_SLOTS = ['Morning Rush', 'Work Hours', 'Evening Rush', 'Off Peak']
+
+# Lookup table: hour of day -> index into TIME_SLOTS
+_SLOT_BY_HOUR = np.array([3] * 6 + [0] * 4 + [1] * 6 + [2] * 4 + [3] * 4, dtype=np.int8)
+
+# Columns the traffic regressor is trained on, in order
+MODEL_FEATURES = ['hour', 'day_of_week', 'month', 'is_weekend', 'weather_main_code', 'weather_description_code',
+                  'temp', 'rain_1h', 'snow_1h', 'clouds_all']
+
+
+def time_slot_codes(hours):
+    """Maps hours (0-23) to TIME_SLOTS indices."""
+    return _SLOT_BY_HOUR[np.asarray(hours, dtype=np.intp)]
+
+
+def time_slots(hours):
+    return pd.Categorical.from_codes(time_slot_codes(hours), categories=TIME_SLOTS)
+
+
+def weekend_flag(day_of_week):
+    """1 for Saturday/Sunday (5, 6), else 0."""
+    return (np.asarray(day_of_week) >= 5).astype(np.int8)
+
+
+def add_calendar_features(df):
+    """Derives hour, day_of_week, month and year from the parsed `date_time` column."""
+    dt = df['date_time'].dt
+    df['hour'] = dt.hour.astype(np.int8)
+    df['day_of_week'] = dt.dayofweek.astype(np.int8) # 0=Monday, 6=Sunday
+    df['month'] = dt.month.astype(np.int8)
+    df['year'] = dt.year.astype(np.int16)
+    return df
+
+
+def encode_weather(df, encoders):
+    """Adds weather code columns and stores weather as categoricals over the encoder vocabulary.
+
+    Codes match `LabelEncoder.transform`; unseen labels raise ValueError.
+    """
+    for col, key in [('weather_main', 'main'), ('weather_description', 'desc')]:
+        classes = encoders[key].classes_
+        values = df[col].to_numpy(dtype=object)
+        codes = np.searchsorted(classes, values)
+        found = classes[np.minimum(codes, len(classes) - 1)] == values
+        if not found.all():
+            unseen = sorted(set(values[~found]))
+            raise ValueError(f"{col} contains previously unseen labels: {unseen}")
+        df[col + '_code'] = codes.astype(np.int64)
+        df[col] = pd.Categorical(values, categories=classes)
+    return df
+
+
+def build_features(df, encoders=None):
+    """Adds the engineered columns used across the project, in place.
+
+    Calendar columns are derived from `date_time` when present, otherwise the given
+    `hour`/`day_of_week` are used as is. Weather codes are added when `encoders`
+    (as saved by preprocessing) are passed and the weather columns are present.
+    """
+    if 'date_time' in df.columns:
+        df = add_calendar_features(df)
+    df['is_weekend'] = weekend_flag(df['day_of_week'])
+    df['time_slot'] = time_slots(df['hour'])
+    if encoders is not None and {'weather_main', 'weather_description'}.issubset(df.columns):
+        df = encode_weather(df, encoders)
+    return df
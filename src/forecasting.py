@@ -0,0 +1,212 @@
+"""Multi-horizon traffic forecasts from the trained regressor.
+
+The regressor's features are calendar fields plus weather, so a forecast for hour
+t+h needs no earlier prediction: every horizon is scored directly. The future hours
+after the last processed `date_time` are expanded against each weather scenario
+into one (scenarios x horizons) float32 matrix and predicted in a single batch.
+
+Forecasts are cached under data/processed/forecasts/ by the forecast origin (the
+latest processed hour), the loaded model and the request, so they are reused until
+new data is ingested or the model is retrained. The cache keeps the most recently
+used FORECAST_CACHE_ENTRIES forecasts.
+
+Run from the project root:  python -m src.forecasting [--horizons 168] [--random-scenarios 500]
+"""
+import os
+import glob
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from src.features import MODEL_FEATURES, weekend_flag
+from src.storage import PROCESSED_DATA_PATH, PROCESSED_STEM, dataset_path, load_dataset, save_dataset
+from src.prediction import RF_MODEL_PATH, LABEL_ENCODER_PATH, WEATHER_SCENARIOS, TrafficPredictor
+
+FORECAST_CACHE_DIR = os.path.join(PROCESSED_DATA_PATH, "forecasts")
+FORECAST_CACHE_ENTRIES = 64
+WEATHER_COLUMNS = ['weather_main', 'weather_description', 'temp', 'rain_1h', 'snow_1h', 'clouds_all']
+CALENDAR_FEATURES = ['hour', 'day_of_week', 'month', 'is_weekend']
+
+
+def future_hours(origin, horizons):
+    """The `horizons` hourly timestamps following `origin`."""
+    return pd.DatetimeIndex(pd.Timestamp(origin) + pd.to_timedelta(np.arange(1, horizons + 1), unit='h'))
+
+
+def calendar_features(timestamps):
+    """(n, 4) calendar block (hour, day_of_week, month, is_weekend) for `timestamps`."""
+    day_of_week = timestamps.dayofweek.to_numpy()
+    return np.column_stack([timestamps.hour.to_numpy(), day_of_week, timestamps.month.to_numpy(),
+                            weekend_flag(day_of_week)]).astype(np.float32)
+
+
+def observed_scenarios(stem=PROCESSED_STEM, n=100, seed=42):
+    """`n` weather scenarios sampled from observed hours, named obs_<i>.
+
+    Useful for ensemble-style spreads and for timing large scenario batches.
+    """
+    weather = load_dataset(stem, columns=WEATHER_COLUMNS)
+    if weather is None:
+        return {}
+    sample = weather.sample(n=n, replace=n > len(weather), random_state=seed)
+    sample = sample.astype({'weather_main': object, 'weather_description': object})
+    return {f"obs_{i}": row for i, row in enumerate(sample.to_dict('records'))}
+
+
+class TrafficForecaster:
+    """Scores every (scenario, horizon) pair of a forecast in one batch and caches the result.
+
+    Scenarios are a dict of name -> weather (WEATHER_COLUMNS, labels for the
+    categoricals), held constant over the forecast window. Forecasts are only cached
+    on disk when the predictor knows which model file it loaded (`model_stamp`).
+    """
+
+    def __init__(self, predictor=None, history_stem=PROCESSED_STEM, model_path=RF_MODEL_PATH,
+                 encoder_path=LABEL_ENCODER_PATH, cache_dir=FORECAST_CACHE_DIR, max_entries=FORECAST_CACHE_ENTRIES):
+        self.predictor = predictor if predictor is not None else TrafficPredictor(model_path, encoder_path)
+        self.history_stem = history_stem
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._cache = {}
+        self.last_timing = {}
+
+    def origin(self):
+        """Latest processed hour: the forecast starts one hour after it."""
+        history = load_dataset(self.history_stem, columns=['date_time'])
+        if history is None or not len(history):
+            return None
+        return history['date_time'].max()
+
+    def cache_key(self, origin, horizons, scenarios):
+        """Hash of the forecast origin, the loaded model and the request."""
+        payload = {'origin': str(origin), 'horizons': horizons, 'scenarios': scenarios,
+                   'model': self.predictor.model_stamp}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+    def _remember(self, key, forecast):
+        self._cache.pop(key, None)
+        self._cache[key] = forecast
+        while len(self._cache) > self.max_entries:
+            self._cache.pop(next(iter(self._cache)))
+
+    def _prune_disk_cache(self):
+        """Deletes all but the `max_entries` most recently used forecast files."""
+        files = sorted(glob.glob(os.path.join(self.cache_dir, "*")), key=os.path.getmtime, reverse=True)
+        for path in files[self.max_entries:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass # removed by another process
+
+    def weather_block(self, scenarios):
+        """(n_scenarios, n_features) float32 matrix with only the weather columns filled in."""
+        frame = pd.DataFrame(list(scenarios.values()), columns=WEATHER_COLUMNS)
+        for col in CALENDAR_FEATURES:
+            frame[col] = 0
+        return self.predictor.feature_matrix(frame)
+
+    def feature_matrix(self, timestamps, scenarios):
+        """Scenario-major (len(scenarios) * len(timestamps), n_features) matrix.
+
+        The calendar block is tiled across scenarios and each scenario's weather row is
+        repeated across horizons; no per-row Python work.
+        """
+        weather = self.weather_block(scenarios)
+        calendar = calendar_features(timestamps)
+        matrix = np.repeat(weather, len(timestamps), axis=0)
+        calendar_idx = [MODEL_FEATURES.index(col) for col in CALENDAR_FEATURES]
+        matrix[:, calendar_idx] = np.tile(calendar, (len(scenarios), 1))
+        return matrix
+
+    def forecast(self, horizons=168, scenarios=None, origin=None, use_cache=True):
+        """Long frame (scenario, horizon, date_time, predicted_volume) for hours 1..`horizons` ahead.
+
+        Returns None when there is no processed data to anchor the forecast.
+        """
+        scenarios = scenarios or WEATHER_SCENARIOS
+        origin = origin if origin is not None else self.origin()
+        if origin is None:
+            return None
+
+        key = self.cache_key(origin, horizons, scenarios)
+        path = os.path.join(self.cache_dir, key)
+        # Without a model stamp a disk entry could belong to another model
+        use_disk = use_cache and self.predictor.model_stamp is not None
+        if use_cache and key in self._cache:
+            self._remember(key, self._cache[key])
+            self.last_timing = {'source': 'memory'}
+            return self._cache[key]
+        if use_disk:
+            cached = load_dataset(path)
+            if cached is not None:
+                os.utime(dataset_path(path)) # most recently used
+                self._remember(key, cached)
+                self.last_timing = {'source': 'disk'}
+                return cached
+
+        start = time.perf_counter()
+        timestamps = future_hours(origin, horizons)
+        matrix = self.feature_matrix(timestamps, scenarios)
+        build_s = time.perf_counter() - start
+        predictions = self.predictor.predict(matrix)
+        predict_s = time.perf_counter() - start - build_s
+
+        forecast = pd.DataFrame({
+            'scenario': pd.Categorical(np.repeat(list(scenarios), horizons), categories=list(scenarios)),
+            'horizon': np.tile(np.arange(1, horizons + 1, dtype=np.int16), len(scenarios)),
+            'date_time': np.tile(timestamps.to_numpy(), len(scenarios)),
+            'predicted_volume': predictions.astype(np.float32),
+        })
+        self.last_timing = {'source': 'computed', 'rows': len(matrix), 'build_s': build_s, 'predict_s': predict_s}
+        if use_disk:
+            save_dataset(forecast, path)
+            self._prune_disk_cache()
+        if use_cache:
+            self._remember(key, forecast)
+        return forecast
+
+
+def report(forecaster, horizons, scenarios):
+    """Prints generation time for a fresh forecast and for cached lookups."""
+    start = time.perf_counter()
+    forecast = forecaster.forecast(horizons, scenarios, use_cache=False)
+    if forecast is None:
+        print("Processed data not found. Run preprocessing first.")
+        return None
+    total_s = time.perf_counter() - start
+    timing = forecaster.last_timing
+    print(f"{len(scenarios)} scenario(s) x {horizons} horizons = {timing['rows']:,} rows in {total_s * 1000:.1f} ms "
+          f"(features {timing['build_s'] * 1000:.1f} ms, predict {timing['predict_s'] * 1000:.1f} ms, "
+          f"{timing['rows'] / timing['predict_s']:,.0f} rows/s)")
+
+    forecaster.forecast(horizons, scenarios) # fill the cache
+    for _ in range(2):
+        start = time.perf_counter()
+        forecaster.forecast(horizons, scenarios)
+        print(f"Cached ({forecaster.last_timing['source']}): {(time.perf_counter() - start) * 1000:.1f} ms")
+        forecaster._cache.clear()
+    return forecast
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--horizons", type=int, default=168, help="Hours ahead to forecast.")
+    parser.add_argument("--random-scenarios", type=int, default=0,
+                        help="Add this many weather scenarios sampled from observed hours.")
+    parser.add_argument("-o", "--output", help="Write the forecast (all scenarios) to this CSV or Parquet file.")
+    args = parser.parse_args()
+
+    forecaster = TrafficForecaster()
+    scenarios = dict(WEATHER_SCENARIOS, **observed_scenarios(n=args.random_scenarios)) if args.random_scenarios else WEATHER_SCENARIOS
+    forecast = report(forecaster, args.horizons, scenarios)
+    if forecast is not None:
+        daily = forecast.assign(day=forecast['date_time'].dt.date)
+        print(daily[daily['scenario'].isin(list(WEATHER_SCENARIOS))]
+              .pivot_table(index='day', columns='scenario', values='predicted_volume', aggfunc='sum', observed=True)
+              .round(0).to_string())
+        if args.output:
+            out_stem, out_ext = os.path.splitext(args.output)
+            save_dataset(forecast, out_stem, fmt=out_ext.lstrip('.') or None)
+            print(f"Saved forecast to {args.output}")
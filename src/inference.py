@@ -0,0 +1,189 @@
+"""Low-overhead inference for the tree-ensemble regressors.
+
+`FlatForest` copies the nodes of every tree of a fitted RandomForest/ExtraTrees
+regressor into one set of contiguous arrays (feature, threshold, left, right, leaf
+value) and walks all (row, tree) pairs together, level by level, dropping pairs
+once they reach a leaf. It skips sklearn's per-call validation and per-tree
+dispatch, which dominate for the small batches the dashboard and service send.
+With numba installed, the walk runs in a compiled per-row kernel instead.
+
+Thresholds are compared exactly as sklearn does (float32 inputs against float64
+thresholds), so predictions match `model.predict` up to the order of the tree sum.
+
+`PredictionCache` is a bounded, thread-safe LRU of predictions keyed by feature
+rows; batches are deduplicated first, so repetitive grids (hour x day x month x
+weather) only score each distinct row once.
+"""
+import threading
+import importlib.util
+from collections import OrderedDict
+import numpy as np
+
+HAS_NUMBA = importlib.util.find_spec("numba") is not None
+
+
+def _walk_rows(X, roots, feature, threshold, left, right, value):
+    """Mean leaf value over all trees for each row (plain loops; compiled with numba when available)."""
+    out = np.empty(X.shape[0])
+    for i in range(X.shape[0]):
+        total = 0.0
+        for root in roots:
+            node = root
+            while left[node] != -1:
+                if X[i, feature[node]] <= threshold[node]:
+                    node = left[node]
+                else:
+                    node = right[node]
+            total += value[node]
+        out[i] = total / len(roots)
+    return out
+
+
+if HAS_NUMBA:
+    import numba
+    _walk_rows = numba.njit(cache=True, nogil=True)(_walk_rows)
+
+
+class FlatForest:
+    """A fitted tree ensemble (regression) flattened into contiguous node arrays."""
+
+    def __init__(self, roots, feature, threshold, left, right, value, n_features):
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.n_features = n_features
+        # Leaves point to themselves so a level step leaves finished pairs in place
+        self._leaf = left == -1
+        self_index = np.arange(len(left), dtype=np.int32)
+        self._left_step = np.where(self._leaf, self_index, left)
+        self._right_step = np.where(self._leaf, self_index, right)
+
+    @classmethod
+    def from_model(cls, model):
+        """Flattens a RandomForestRegressor/ExtraTreesRegressor (or a single tree); ValueError otherwise."""
+        if hasattr(model, 'tree_'):
+            estimators = [model]
+        elif isinstance(getattr(model, 'estimators_', None), list):
+            # Forests keep a list of trees; boosting (an ndarray of stages) sums scaled trees instead
+            estimators = model.estimators_
+        else:
+            estimators = []
+        trees = [getattr(estimator, 'tree_', None) for estimator in estimators]
+        if not trees or any(tree is None for tree in trees) or trees[0].n_outputs != 1 or hasattr(model, 'classes_'):
+            raise ValueError(f"Cannot flatten {type(model).__name__}: only single-output tree regressors are supported")
+
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        left = np.concatenate([np.where(tree.children_left == -1, -1, tree.children_left + offset)
+                               for tree, offset in zip(trees, offsets)]).astype(np.int32)
+        right = np.concatenate([np.where(tree.children_right == -1, -1, tree.children_right + offset)
+                                for tree, offset in zip(trees, offsets)]).astype(np.int32)
+        return cls(roots=offsets.astype(np.int32),
+                     feature=np.concatenate([np.maximum(tree.feature, 0) for tree in trees]).astype(np.int32),
+                     threshold=np.concatenate([tree.threshold for tree in trees]).astype(np.float64),
+                     left=left, right=right,
+                     value=np.concatenate([tree.value[:, 0, 0] for tree in trees]).astype(np.float64),
+                     n_features=model.n_features_in_)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right, self.value))
+
+    def _prepare(self, X):
+        # sklearn casts inputs to float32 and compares them with float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+        return X.astype(np.float64)
+
+    def predict(self, X):
+        """Mean of the trees' leaf values for each row of `X`."""
+        X = self._prepare(X)
+        if HAS_NUMBA:
+            return _walk_rows(X, self.roots, self.feature, self.threshold, self.left, self.right, self.value)
+        if len(X) == 1:
+            return self._predict_one(X[0])
+
+        n_rows, n_trees = len(X), len(self.roots)
+        node = np.tile(self.roots, n_rows)
+        row_offset = np.repeat(np.arange(n_rows) * X.shape[1], n_trees)
+        flat_X = X.ravel()
+        active = np.flatnonzero(~self._leaf[node])
+        while active.size:
+            current = node[active]
+            go_left = flat_X[row_offset[active] + self.feature[current]] <= self.threshold[current]
+            node[active] = np.where(go_left, self._left_step[current], self._right_step[current])
+            active = active[~self._leaf[node[active]]]
+        return self.value[node].reshape(n_rows, n_trees).mean(axis=1)
+
+    def _predict_one(self, x):
+        """Single-row fast path: all trees step together on one feature vector."""
+        node = self.roots.copy()
+        active = ~self._leaf[node]
+        while active.any():
+            current = node[active]
+            node[active] = np.where(x[self.feature[current]] <= self.threshold[current],
+                                    self._left_step[current], self._right_step[current])
+            active[active] = ~self._leaf[node[active]]
+        return np.array([self.value[node].mean()])
+
+
+class PredictionCache:
+    """Bounded LRU cache of predictions keyed by feature rows.
+
+    By default (`decimals=None`) keys are the exact float32 rows, so cached values are
+    the model's own predictions. With `decimals`, rows are keyed after rounding and
+    rows that round alike share the prediction of the first (exact) row scored. Safe
+    to share between threads; `predict` runs outside the lock.
+    """
+
+    def __init__(self, maxsize=100_000, decimals=None):
+        self.maxsize = maxsize
+        self.decimals = decimals
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def predict(self, X, predict):
+        """Predictions for the rows of `X`, calling `predict` only on distinct uncached rows."""
+        X = np.asarray(X, dtype=np.float32)
+        keyed = X if self.decimals is None else np.round(X, self.decimals)
+        unique, first, inverse = np.unique(keyed, axis=0, return_index=True, return_inverse=True)
+        keys = [row.tobytes() for row in unique]
+        values = np.empty(len(unique))
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                value = self._entries.get(key)
+                if value is None:
+                    missing.append(i)
+                else:
+                    self._entries.move_to_end(key)
+                    values[i] = value
+            self.hits += len(unique) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            # Score the exact rows; the rounded rows are only keys
+            values[missing] = predict(X[first[missing]])
+            with self._lock:
+                for i in missing:
+                    self._entries[keys[i]] = values[i]
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return values[inverse.ravel()]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
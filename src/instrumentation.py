@@ -0,0 +1,289 @@
+"""Timing and memory instrumentation for pipeline stages and dashboard renders.
+
+    @timed("mining.train_clustering")          # decorator
+    with span("app.tab.overview") as s:        # context manager
+        ...
+        s.rows = len(frame)
+
+Each operation records wall time, CPU time, rows (and rows/s) and memory: the
+process's resident and peak resident set, or with tracemalloc the peak traced
+allocations inside the operation. Records are kept in memory for the dashboard and
+appended to data/processed/metrics.jsonl; `prometheus_text` renders them in the
+Prometheus text format, served by `python -m src.instrumentation serve`.
+
+Disabled by default, in which case `span` returns a shared no-op object and decorated
+functions cost one flag check. Enable with `enable()` or, for a whole run including
+worker processes, with environment variables:
+
+    TRAFFIC_METRICS=1      record operations
+    TRAFFIC_PROFILE=1      also cProfile each top-level operation into data/processed/profiles/
+    TRAFFIC_TRACEMALLOC=1  measure peak allocations with tracemalloc (slows allocation-heavy code)
+
+Run from the project root:  python -m src.instrumentation report | serve [--port 9108]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import functools
+import tracemalloc
+from collections import deque
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+METRICS_PATH = os.path.join("data", "processed", "metrics.jsonl")
+PROFILES_DIR = os.path.join("data", "processed", "profiles")
+
+_config = {
+    'enabled': os.environ.get("TRAFFIC_METRICS", "") not in ("", "0"),
+    'profile': os.environ.get("TRAFFIC_PROFILE", "") not in ("", "0"),
+    'trace_memory': os.environ.get("TRAFFIC_TRACEMALLOC", "") not in ("", "0"),
+    'path': os.environ.get("TRAFFIC_METRICS_PATH", METRICS_PATH),
+}
+if _config['enabled'] and _config['trace_memory']:
+    tracemalloc.start()
+_records = deque(maxlen=10_000)
+_stack = threading.local()
+_write_lock = threading.Lock()
+
+
+def enable(path=METRICS_PATH, profile=False, trace_memory=False):
+    """Starts recording in this process; `path=None` keeps records in memory only."""
+    _config.update(enabled=True, path=path, profile=profile, trace_memory=trace_memory)
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    _config['enabled'] = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def is_enabled():
+    return _config['enabled']
+
+
+def _status_mb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1]) / 1e3
+    return None
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB (None where it cannot be read)."""
+    # On Linux ru_maxrss survives fork/exec, so a fresh worker would report its
+    # parent's peak; VmHWM belongs to the current process image only
+    if os.path.exists("/proc/self/status"):
+        return _status_mb("VmHWM:")
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def rss_mb():
+    """Current resident memory of this process in MB (None where it cannot be read)."""
+    return _status_mb("VmRSS:") if os.path.exists("/proc/self/status") else None
+
+
+class _Span:
+    """One recorded operation; nested spans record their parent's name."""
+
+    __slots__ = ('name', 'rows', 'parent', '_wall', '_cpu', '_profiler', '_traced_peak')
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+        self.parent = None
+        self._profiler = None
+        self._traced_peak = 0
+
+    def __enter__(self):
+        stack = _stack.__dict__.setdefault('spans', [])
+        self.parent = stack[-1] if stack else None
+        stack.append(self)
+        if _config['profile'] and self.parent is None:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall_s = time.perf_counter() - self._wall
+        cpu_s = time.process_time() - self._cpu
+        if self._profiler is not None:
+            self._profiler.disable()
+        _stack.spans.pop()
+
+        record = {'name': self.name, 'ts': datetime.now().isoformat(timespec='milliseconds'), 'pid': os.getpid(),
+                  'parent': self.parent.name if self.parent else None, 'wall_s': wall_s, 'cpu_s': cpu_s,
+                  'rows': self.rows, 'rows_per_s': self.rows / wall_s if self.rows and wall_s > 0 else None,
+                  'rss_mb': rss_mb(), 'peak_rss_mb': peak_rss_mb(), 'error': exc_type.__name__ if exc_type else None}
+        if tracemalloc.is_tracing():
+            # A child resets the traced peak, so the parent's peak is the max of its own and its children's
+            peak = max(tracemalloc.get_traced_memory()[1], self._traced_peak)
+            record['traced_peak_mb'] = peak / 1e6
+            if self.parent is not None:
+                self.parent._traced_peak = max(self.parent._traced_peak, peak)
+        if self._profiler is not None:
+            os.makedirs(PROFILES_DIR, exist_ok=True)
+            record['profile'] = os.path.join(PROFILES_DIR, f"{self.name}-{os.getpid()}-{int(time.time() * 1000)}.prof")
+            self._profiler.dump_stats(record['profile'])
+        _record(record)
+        return False
+
+
+class _NullSpan:
+    """Stand-in returned while instrumentation is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _record(record):
+    _records.append(record)
+    if _config['path']:
+        directory = os.path.dirname(_config['path'])
+        with _write_lock:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(_config['path'], "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+
+def span(name, rows=None):
+    """Context manager recording one operation; set `.rows` on it when the row count is known late."""
+    return _Span(name, rows) if _config['enabled'] else _NULL_SPAN
+
+
+def timed(name=None, rows=None):
+    """Decorator recording every call of a function as an operation.
+
+    `rows(result, *args, **kwargs)` may return the number of rows the call processed.
+    """
+    def decorate(func):
+        label = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _config['enabled']:
+                return func(*args, **kwargs)
+            with _Span(label) as recorded:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    recorded.rows = rows(result, *args, **kwargs)
+            return result
+        return wrapper
+    return decorate
+
+
+def recent_records():
+    """Records of this process, oldest first."""
+    return list(_records)
+
+
+def load_records(path=METRICS_PATH):
+    """Records appended to `path` by all runs."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(records):
+    """Per-operation calls, total/mean/max wall time, CPU time, rows and peak memory, slowest first."""
+    import pandas as pd
+
+    columns = ['name', 'calls', 'total_s', 'mean_s', 'max_s', 'cpu_s', 'rows', 'peak_rss_mb']
+    if not records:
+        return pd.DataFrame(columns=columns)
+    frame = pd.DataFrame.from_records(records)
+    frame[['rows', 'peak_rss_mb']] = frame[['rows', 'peak_rss_mb']].apply(pd.to_numeric)
+    summary = frame.groupby('name').agg(calls=('wall_s', 'size'), total_s=('wall_s', 'sum'), mean_s=('wall_s', 'mean'),
+                                        max_s=('wall_s', 'max'), cpu_s=('cpu_s', 'sum'), rows=('rows', 'sum'),
+                                        peak_rss_mb=('peak_rss_mb', 'max'))
+    return summary.reset_index().sort_values('max_s', ascending=False, ignore_index=True)[columns]
+
+
+def prometheus_text(records):
+    """Renders the per-operation summary in the Prometheus text exposition format."""
+    metrics = [
+        ('traffic_operation_seconds_sum', 'counter', 'Total wall time of the operation.', 'total_s'),
+        ('traffic_operation_seconds_count', 'counter', 'Number of recorded calls.', 'calls'),
+        ('traffic_operation_seconds_max', 'gauge', 'Slowest recorded call.', 'max_s'),
+        ('traffic_operation_cpu_seconds_sum', 'counter', 'Total CPU time of the operation.', 'cpu_s'),
+        ('traffic_operation_rows_total', 'counter', 'Rows processed by the operation.', 'rows'),
+        ('traffic_operation_peak_rss_megabytes', 'gauge', 'Peak process RSS after the operation.', 'peak_rss_mb'),
+    ]
+    summary = summarize(records)
+    lines = []
+    for metric, kind, help_text, column in metrics:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        for name, value in zip(summary['name'], summary[column]):
+            if value == value and value is not None: # skip NaN
+                lines.append(f'{metric}{{operation="{name}"}} {float(value):.6g}')
+    return "\n".join(lines) + "\n"
+
+
+def serve(path=METRICS_PATH, host="127.0.0.1", port=9108):
+    """Serves GET /metrics (Prometheus text) rendered from the records in `path`."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            payload = prometheus_text(load_records(path)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    print(f"Serving metrics on http://{host}:{port}/metrics")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["report", "serve"])
+    parser.add_argument("--path", default=METRICS_PATH)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9108)
+    parser.add_argument("--top", type=int, default=20, help="Operations to show in the report.")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.path, args.host, args.port)
+    else:
+        print(summarize(load_records(args.path)).head(args.top).to_string(index=False, float_format=lambda v: f"{v:.3f}"))
@@ -0,0 +1,68 @@
+import os
+import json
+import hashlib
+
+MANIFEST_PATH = os.path.join("data", "processed", "manifest.json")
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Loads the pipeline manifest (file hashes, stage keys, ingested files)."""
+    if not os.path.exists(path):
+        return {"files": {}, "stages": {}}
+    with open(path) as f:
+        manifest = json.load(f)
+    # Older manifests cached the watermark, which went stale after full rebuilds
+    manifest.pop("watermark", None)
+    manifest.setdefault("files", {})
+    manifest.setdefault("stages", {})
+    return manifest
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def file_hash(path, manifest=None):
+    """SHA-256 of a file's contents.
+
+    With a manifest, the hash is reused while the file's size and mtime are unchanged.
+    """
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    if manifest is not None:
+        entry = manifest["files"].get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return entry["sha256"]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    sha = digest.hexdigest()
+    if manifest is not None:
+        manifest["files"][key] = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": sha}
+    return sha
+
+
+def inputs_hash(paths, params=None, manifest=None):
+    """Combined hash of input files (missing ones count as absent) and stage parameters."""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode())
+        digest.update(file_hash(path, manifest).encode() if os.path.exists(path) else b"missing")
+    digest.update(json.dumps(params or {}, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def stage_is_current(manifest, stage, key):
+    return manifest["stages"].get(stage) == key
+
+
+def record_stage(manifest, stage, key):
+    manifest["stages"][stage] = key
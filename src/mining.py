@@ -1,93 +1,360 @@
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
-from sklearn.ensemble import IsolationForest, RandomForestRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_absolute_error, r2_score
-import joblib
 import os
+import time
+import argparse
+from src.storage import PROCESSED_STEM, ENHANCED_STEM, load_dataset, save_dataset, dataset_path, downcast_dtypes, frame_memory_mb
+from src.manifest import load_manifest, save_manifest, inputs_hash, stage_is_current, record_stage
+from src.features import MODEL_FEATURES
+from src.artifacts import save_artifact, load_artifact
+from src.feature_store import time_split
+from src.clustering import CLUSTER_FEATURES, KMEANS_PATH, SCALER_PATH, ScalableClusterer, select_n_clusters
+from src.aggregates import build_cube
+from src.instrumentation import timed
 
-PROCESSED_DATA_PATH = os.path.join("data", "processed", "traffic_processed.csv")
 MODELS_DIR = os.path.join("data", "models")
+RF_MODEL_PATH = os.path.join(MODELS_DIR, "rf_traffic_predictor.pkl")
+ISOLATION_FOREST_PATH = os.path.join(MODELS_DIR, "isolation_forest.pkl")
+VARIANTS_DIR = os.path.join(MODELS_DIR, "variants")
+
+# Regressor variants, from the most accurate to the smallest / fastest to load and score.
+# Estimators are named (classes in sklearn.ensemble) so importing this module does not load sklearn
+MODEL_VARIANTS = {
+    'full': ('RandomForestRegressor', {'n_estimators': 100}),
+    'compact': ('RandomForestRegressor', {'n_estimators': 50, 'max_depth': 18, 'min_samples_leaf': 3}),
+    'small': ('RandomForestRegressor', {'n_estimators': 25, 'max_depth': 12, 'max_leaf_nodes': 2048}),
+    'hist_gb': ('HistGradientBoostingRegressor', {'max_iter': 300, 'max_leaf_nodes': 63}),
+}
+
+ANOMALY_FEATURES = ['traffic_volume', 'hour']
+
+# Column layout of the compact float32 matrix, ordered so that each model's inputs
+# are a contiguous column range and can be handed out as views
+MATRIX_COLUMNS = ['traffic_volume'] + MODEL_FEATURES
+
+
+def _matrix_slice(columns):
+    start = MATRIX_COLUMNS.index(columns[0])
+    if MATRIX_COLUMNS[start:start + len(columns)] != list(columns):
+        raise ValueError(f"{columns} are not contiguous in MATRIX_COLUMNS")
+    return slice(start, start + len(columns))
+
+
+CLUSTER_SLICE = _matrix_slice(CLUSTER_FEATURES)
+ANOMALY_SLICE = _matrix_slice(ANOMALY_FEATURES)
+MODEL_SLICE = _matrix_slice(MODEL_FEATURES)
+TARGET_COLUMN = MATRIX_COLUMNS.index('traffic_volume')
+
+
+def make_regressor(variant='full', n_jobs=-1):
+    from sklearn import ensemble
+
+    name, params = MODEL_VARIANTS[variant]
+    params = dict(params, random_state=42)
+    if name == 'RandomForestRegressor':
+        params['n_jobs'] = n_jobs # All cores by default
+    return getattr(ensemble, name)(**params)
+
+
+def set_feature_names(model, names):
+    # Models fitted on the compact matrix get the names a DataFrame fit would record,
+    # so the artifacts behave the same for callers passing DataFrames
+    model.feature_names_in_ = np.asarray(names, dtype=object)
+    return model
+
+
+def _miner_rows(result, miner, *args, **kwargs):
+    return len(miner.df) if miner.df is not None else 0
 
-if not os.path.exists(MODELS_DIR):
-    os.makedirs(MODELS_DIR)
 
 class TrafficMiner:
-    def __init__(self):
+    """Trains the clustering, anomaly and regression models on one dataset.
+
+    Artifacts are written to `models_dir` (data/models by default, one directory per
+    station for partitioned data); `n_jobs` bounds the regressor's threads. In compact
+    mode (`load_data(compact=True)`) the models train on views of one float32 matrix.
+    """
+    def __init__(self, models_dir=MODELS_DIR, n_jobs=-1):
+        self.models_dir = models_dir
+        self.n_jobs = n_jobs
         self.df = None
+        self.columns = None
+        self.downcast = False
+        self.matrix = None
+        self.copies = 0
+        self.views = 0
+        self.memory = {}
         self.kmeans_model = None
         self.anomaly_model = None
         self.rf_model = None
 
-    def load_data(self):
-        if os.path.exists(PROCESSED_DATA_PATH):
-            self.df = pd.read_csv(PROCESSED_DATA_PATH)
-            return True
-        return False
+    def model_path(self, default_path):
+        """Path of an artifact inside this miner's models directory."""
+        return os.path.join(self.models_dir, os.path.basename(default_path))
+
+    @timed("mining.load_data", rows=_miner_rows)
+    def load_data(self, columns=None, compact=False):
+        self.columns = columns
+        self.df = load_dataset(PROCESSED_STEM, columns=columns, downcast=compact)
+        if self.df is not None and compact:
+            self.compact()
+        return self.df is not None
+
+    @timed("mining.compact", rows=_miner_rows)
+    def compact(self):
+        """Downcasts the frame and builds the shared C-contiguous float32 matrix of MATRIX_COLUMNS.
+
+        The matrix is only built when all MATRIX_COLUMNS are loaded; rows are kept in
+        time order so the time split is a pair of row ranges.
+        """
+        self.df = downcast_dtypes(self.df)
+        self.downcast = True
+        if 'date_time' in self.df.columns and not self.df['date_time'].is_monotonic_increasing:
+            self.df = self.df.sort_values('date_time', kind='stable', ignore_index=True)
+            self.copies += 1
+
+        if set(MATRIX_COLUMNS).issubset(self.df.columns):
+            self.matrix = np.empty((len(self.df), len(MATRIX_COLUMNS)), dtype=np.float32)
+            for i, col in enumerate(MATRIX_COLUMNS):
+                self.matrix[:, i] = self.df[col].to_numpy()
+            self.copies += 1
+            self.memory['matrix_mb'] = self.matrix.nbytes / 1e6
+        return self
+
+    def enhanced_frame(self):
+        """The loaded data with the mined columns (cluster, anomaly, is_anomaly) at stored precision.
+
+        In compact mode `df` holds lossy downcast columns, so the stored columns are read
+        again in full precision (and in the same time order) and only the mined columns
+        are taken from `df`.
+        """
+        if self.df is None or not self.downcast:
+            return self.df
+        full = load_dataset(PROCESSED_STEM, columns=self.columns)
+        if 'date_time' in full.columns and not full['date_time'].is_monotonic_increasing:
+            full = full.sort_values('date_time', kind='stable', ignore_index=True)
+        for col in ('cluster', 'anomaly', 'is_anomaly'):
+            if col in self.df.columns:
+                full[col] = self.df[col].to_numpy()
+        return full
+
+    def _view(self, rows=slice(None), cols=slice(None)):
+        """A view of the compact matrix (never a copy)."""
+        view = self.matrix[rows, cols]
+        assert np.shares_memory(view, self.matrix)
+        self.views += 1
+        return view
 
-    def train_clustering(self, n_clusters=4):
-        """Groups traffic patterns into clusters."""
+    def memory_report(self):
+        """Frame/matrix memory in MB and the number of copies made and views handed to models."""
+        report = dict(self.memory, copies=self.copies, views=self.views)
+        if self.df is not None:
+            report['frame_mb'] = float(frame_memory_mb(self.df))
+        return report
+
+    @timed("mining.train_clustering", rows=_miner_rows)
+    def train_clustering(self, n_clusters=4, engine='kmeans', chunk_size=100_000):
+        """Groups traffic patterns into clusters.
+
+        engine='kmeans' is full KMeans on raw features; engine='minibatch' standardizes the
+        features and trains MiniBatchKMeans chunk by chunk (n_clusters=None picks k by silhouette).
+        """
         if self.df is None: return
+        if n_clusters is None and engine != 'minibatch':
+            raise ValueError("Choosing the number of clusters automatically needs engine='minibatch'")
         
+        if engine == 'minibatch':
+            if n_clusters is None:
+                n_clusters, _ = select_n_clusters(self.df)
+                print(f"Selected {n_clusters} clusters")
+            features = self._view(cols=CLUSTER_SLICE) if self.matrix is not None else self.df
+            clusterer = ScalableClusterer(n_clusters=n_clusters, chunk_size=chunk_size).fit(features)
+            self.kmeans_model = clusterer.model
+            self.df['cluster'] = clusterer.predict(features)
+            clusterer.save(self.model_path(KMEANS_PATH), self.model_path(SCALER_PATH))
+            return self.df
+
+        from sklearn.cluster import KMeans
+
         # Features for clustering: Traffic Vol, Hour, Day of Week
-        features = self.df[['traffic_volume', 'hour', 'day_of_week']]
+        if self.matrix is not None:
+            features = self._view(cols=CLUSTER_SLICE)
+        else:
+            features = self.df[CLUSTER_FEATURES]
         
         self.kmeans_model = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
         self.df['cluster'] = self.kmeans_model.fit_predict(features)
+        if self.matrix is not None:
+            set_feature_names(self.kmeans_model, CLUSTER_FEATURES)
         
-        # Save model
-        joblib.dump(self.kmeans_model, os.path.join(MODELS_DIR, "kmeans_traffic.pkl"))
+        # Save model; a scaler left by an earlier minibatch run does not belong to it
+        save_artifact(self.kmeans_model, self.model_path(KMEANS_PATH))
+        if os.path.exists(self.model_path(SCALER_PATH)):
+            os.remove(self.model_path(SCALER_PATH))
         return self.df
 
+    def update_clustering(self, new_df):
+        """Updates persisted minibatch clusters with new rows (partial_fit) and labels them."""
+        clusterer = ScalableClusterer.load(self.model_path(KMEANS_PATH), self.model_path(SCALER_PATH)).partial_fit(new_df)
+        clusterer.save(self.model_path(KMEANS_PATH), self.model_path(SCALER_PATH))
+        self.kmeans_model = clusterer.model
+        return clusterer.predict(new_df)
+
+    @timed("mining.detect_anomalies", rows=_miner_rows)
     def detect_anomalies(self, contamination=0.01):
         """Detects anomalous traffic volumes."""
         if self.df is None: return
+        from sklearn.ensemble import IsolationForest
         
-        features = self.df[['traffic_volume', 'hour']]
+        if self.matrix is not None:
+            features = self._view(cols=ANOMALY_SLICE)
+        else:
+            features = self.df[ANOMALY_FEATURES]
         
         self.anomaly_model = IsolationForest(contamination=contamination, random_state=42)
         self.df['anomaly'] = self.anomaly_model.fit_predict(features)
+        if self.matrix is not None:
+            set_feature_names(self.anomaly_model, ANOMALY_FEATURES)
         # -1 is anomaly, 1 is normal. Map to boolean for easier usage.
         self.df['is_anomaly'] = self.df['anomaly'] == -1
         
-        joblib.dump(self.anomaly_model, os.path.join(MODELS_DIR, "isolation_forest.pkl"))
+        save_artifact(self.anomaly_model, self.model_path(ISOLATION_FOREST_PATH))
         return self.df
 
-    def train_prediction_model(self):
-        """Trains a Random Forest Regressor to predict traffic volume."""
+    def _prediction_split(self, split='time'):
+        """Train/test split; 'time' holds out the latest 20% of hours so no future data leaks into training.
+
+        In compact mode the time split returns views of the matrix (rows are already in time order).
+        """
+        from sklearn.model_selection import train_test_split
+
+        if self.matrix is not None:
+            if split == 'random':
+                self.copies += 4
+                return train_test_split(self._view(cols=MODEL_SLICE), self._view(cols=TARGET_COLUMN),
+                                        test_size=0.2, random_state=42)
+            cut = int(len(self.matrix) * 0.8)
+            return (self._view(slice(None, cut), MODEL_SLICE), self._view(slice(cut, None), MODEL_SLICE),
+                    self._view(slice(None, cut), TARGET_COLUMN), self._view(slice(cut, None), TARGET_COLUMN))
+        if split == 'random':
+            return train_test_split(self.df[MODEL_FEATURES], self.df['traffic_volume'], test_size=0.2, random_state=42)
+        train, test = time_split(self.df.sort_values('date_time', kind='stable'), test_size=0.2)
+        return train[MODEL_FEATURES], test[MODEL_FEATURES], train['traffic_volume'], test['traffic_volume']
+
+    @timed("mining.train_prediction_model", rows=_miner_rows)
+    def train_prediction_model(self, variant='full', compress=0, split='time'):
+        """Trains the traffic volume regressor (a Random Forest unless another variant is chosen).
+
+        `compress=0` keeps the artifact memory-mappable; see MODEL_VARIANTS for
+        smaller and faster variants.
+        """
         if self.df is None: return
+        from sklearn.metrics import mean_absolute_error, r2_score
         
-        feature_cols = ['hour', 'day_of_week', 'month', 'is_weekend', 'weather_main_code', 'weather_description_code', 'temp', 'rain_1h', 'snow_1h', 'clouds_all']
-        target_col = 'traffic_volume'
-        
-        X = self.df[feature_cols]
-        y = self.df[target_col]
-        
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        X_train, X_test, y_train, y_test = self._prediction_split(split)
         
-        self.rf_model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1) # Use all cores
+        self.rf_model = make_regressor(variant, self.n_jobs)
         self.rf_model.fit(X_train, y_train)
         
         y_pred = self.rf_model.predict(X_test)
         mae = mean_absolute_error(y_test, y_pred)
         r2 = r2_score(y_test, y_pred)
+        if self.matrix is not None:
+            set_feature_names(self.rf_model, MODEL_FEATURES)
         
         metrics = {"MAE": mae, "R2": r2}
-        joblib.dump(self.rf_model, os.path.join(MODELS_DIR, "rf_traffic_predictor.pkl"))
-        print(f"Model Trained. MAE: {mae:.2f}, R2: {r2:.2f}")
+        save_artifact(self.rf_model, self.model_path(RF_MODEL_PATH), compress=compress)
+        print(f"Model Trained ({variant}). MAE: {mae:.2f}, R2: {r2:.2f}")
         return metrics
 
-if __name__ == "__main__":
-    miner = TrafficMiner()
-    if miner.load_data():
-        print("Training Clustering...")
-        miner.train_clustering()
-        print("Detecting Anomalies...")
-        miner.detect_anomalies()
-        print("Training Prediction Model...")
-        miner.train_prediction_model()
+    def profile_model_variants(self, variants=None, compress=0, batch_rows=1000, single_calls=50):
+        """Trains each regressor variant and reports artifact size, load time, latency and accuracy.
+
+        Variant artifacts go to data/models/variants/; the production model is not replaced.
+        """
+        if self.df is None: return
+        from sklearn.metrics import mean_absolute_error, r2_score
         
-        # Save enriched data
-        miner.df.to_csv(os.path.join("data", "processed", "traffic_enhanced.csv"), index=False)
-        print("Mining complete. Enhanced data saved.")
+        X_train, X_test, y_train, y_test = self._prediction_split()
+        batch = X_test[:batch_rows]
+        single = X_test[:1]
+        rows = []
+        for variant in variants or MODEL_VARIANTS:
+            model = make_regressor(variant, self.n_jobs)
+            start = time.perf_counter()
+            model.fit(X_train, y_train)
+            fit_s = time.perf_counter() - start
+
+            path = save_artifact(model, os.path.join(VARIANTS_DIR, f"{variant}.pkl"), compress=compress)
+            start = time.perf_counter()
+            model = load_artifact(path)
+            load_s = time.perf_counter() - start
+            if hasattr(model, 'n_jobs'):
+                model.n_jobs = 1
+
+            start = time.perf_counter()
+            for _ in range(single_calls):
+                model.predict(single)
+            single_ms = (time.perf_counter() - start) / single_calls * 1000
+            start = time.perf_counter()
+            model.predict(batch)
+            batch_us = (time.perf_counter() - start) / len(batch) * 1e6
+
+            y_pred = model.predict(X_test)
+            rows.append({
+                'variant': variant, 'size_mb': os.path.getsize(path) / 1e6, 'fit_s': fit_s, 'load_s': load_s,
+                'single_row_ms': single_ms, 'batch_us_per_row': batch_us,
+                'MAE': mean_absolute_error(y_test, y_pred), 'R2': r2_score(y_test, y_pred),
+            })
+        report = pd.DataFrame(rows)
+        print(report.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+        return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the traffic mining models.")
+    parser.add_argument("--force", action="store_true", help="Retrain even if the processed data is unchanged.")
+    parser.add_argument("--variant", choices=list(MODEL_VARIANTS), default="full", help="Regressor variant to train.")
+    parser.add_argument("--compress", type=int, default=0,
+                        help="joblib compression level for the regressor (0 keeps it memory-mappable).")
+    parser.add_argument("--cluster-engine", choices=["kmeans", "minibatch"], default="kmeans",
+                        help="Full KMeans, or scaled MiniBatchKMeans trained in chunks.")
+    parser.add_argument("--clusters", default="4", help="Number of clusters, or 'auto' (minibatch engine only).")
+    parser.add_argument("--compact", action="store_true",
+                        help="Downcast dtypes and train on views of one float32 matrix (lower peak memory).")
+    parser.add_argument("--profile-models", action="store_true",
+                        help="Compare size, load time, latency and accuracy of all regressor variants.")
+    args = parser.parse_args()
+    if args.clusters == 'auto' and args.cluster_engine != 'minibatch':
+        parser.error("--clusters auto requires --cluster-engine minibatch")
+
+    if args.profile_models:
+        miner = TrafficMiner()
+        if miner.load_data(compact=args.compact):
+            miner.profile_model_variants(compress=args.compress)
+    else:
+        manifest = load_manifest()
+        key = inputs_hash([dataset_path(PROCESSED_STEM)], {'variant': args.variant, 'compress': args.compress, 'cluster_engine': args.cluster_engine, 'clusters': args.clusters, 'compact': args.compact}, manifest)
+        if not args.force and stage_is_current(manifest, "mine", key) and os.path.exists(dataset_path(ENHANCED_STEM)):
+            print("Processed data unchanged since last run; skipping mining.")
+            build_cube(manifest=manifest)
+            save_manifest(manifest)
+        else:
+            miner = TrafficMiner()
+            if miner.load_data(compact=args.compact):
+                print("Training Clustering...")
+                miner.train_clustering(n_clusters=None if args.clusters == 'auto' else int(args.clusters),
+                                       engine=args.cluster_engine)
+                print("Detecting Anomalies...")
+                miner.detect_anomalies()
+                print("Training Prediction Model...")
+                miner.train_prediction_model(variant=args.variant, compress=args.compress)
+
+                # Save enriched data
+                save_dataset(miner.enhanced_frame(), ENHANCED_STEM)
+                print("Mining complete. Enhanced data saved.")
+                if args.compact:
+                    print("Memory:", ", ".join(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}"
+                                               for k, v in miner.memory_report().items()))
+                record_stage(manifest, "mine", key)
+                build_cube(manifest=manifest)
+                save_manifest(manifest)
@@ -0,0 +1,120 @@
+"""Streaming anomaly detection for live traffic records.
+
+OnlineAnomalyDetector keeps Welford running mean/variance of `traffic_volume` per
+(hour, day_of_week) slot -- 168 slots, constant memory -- and flags records whose
+z-score against their slot exceeds a threshold. IsolationForestScorer scores new
+records against the persisted batch model without refitting it.
+"""
+import math
+import os
+import warnings
+import numpy as np
+from src.artifacts import load_artifact
+
+ISOLATION_FOREST_PATH = os.path.join("data", "models", "isolation_forest.pkl")
+N_SLOTS = 24 * 7
+
+
+class OnlineAnomalyDetector:
+    """Per-(hour, day_of_week) Welford statistics with z-score anomaly flags.
+
+    Each record is scored against its slot's statistics *before* being added to
+    them. Slots with fewer than `min_count` records never flag anomalies.
+    """
+
+    def __init__(self, threshold=3.5, min_count=10):
+        self.threshold = threshold
+        self.min_count = min_count
+        self.count = [0] * N_SLOTS
+        self.mean = [0.0] * N_SLOTS
+        self.m2 = [0.0] * N_SLOTS
+
+    def score(self, hour, day_of_week, volume):
+        """Absolute z-score of `volume` for its slot (0.0 while the slot is warming up)."""
+        slot = hour * 7 + day_of_week
+        n = self.count[slot]
+        if n < self.min_count:
+            return 0.0
+        std = math.sqrt(self.m2[slot] / (n - 1))
+        return abs(volume - self.mean[slot]) / std if std > 0 else 0.0
+
+    def update(self, hour, day_of_week, volume):
+        """Scores one record, adds it to its slot and returns True if it is anomalous."""
+        slot = hour * 7 + day_of_week
+        n = self.count[slot]
+        mean = self.mean[slot]
+        is_anomaly = False
+        if n >= self.min_count:
+            variance = self.m2[slot] / (n - 1)
+            is_anomaly = variance > 0 and (volume - mean) ** 2 > self.threshold ** 2 * variance
+
+        n += 1
+        delta = volume - mean
+        mean += delta / n
+        self.count[slot] = n
+        self.mean[slot] = mean
+        self.m2[slot] += delta * (volume - mean)
+        return is_anomaly
+
+    def update_batch(self, hours, days_of_week, volumes):
+        """Vectorized update for a small batch; the whole batch is scored against the state before it.
+
+        Returns a boolean array of anomaly flags.
+        """
+        slots = np.asarray(hours, dtype=np.intp) * 7 + np.asarray(days_of_week, dtype=np.intp)
+        volumes = np.asarray(volumes, dtype=np.float64)
+        count = np.array(self.count, dtype=np.float64)
+        mean = np.array(self.mean)
+        m2 = np.array(self.m2)
+
+        n = count[slots]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = np.where(n > 1, m2[slots] / (n - 1), 0.0)
+        flags = (n >= self.min_count) & (variance > 0) & ((volumes - mean[slots]) ** 2 > self.threshold ** 2 * variance)
+
+        # Merge the batch into the slot statistics (Chan et al. parallel combination)
+        b_count = np.bincount(slots, minlength=N_SLOTS).astype(np.float64)
+        b_sum = np.bincount(slots, weights=volumes, minlength=N_SLOTS)
+        touched = b_count > 0
+        b_mean = np.zeros(N_SLOTS)
+        b_mean[touched] = b_sum[touched] / b_count[touched]
+        b_m2 = np.bincount(slots, weights=(volumes - b_mean[slots]) ** 2, minlength=N_SLOTS)
+
+        total = count + b_count
+        delta = b_mean - mean
+        new_mean = mean.copy()
+        new_mean[touched] += delta[touched] * b_count[touched] / total[touched]
+        new_m2 = m2 + b_m2
+        new_m2[touched] += delta[touched] ** 2 * count[touched] * b_count[touched] / total[touched]
+
+        self.count = total.astype(np.int64).tolist()
+        self.mean = new_mean.tolist()
+        self.m2 = new_m2.tolist()
+        return flags
+
+    def slot_stats(self):
+        """Current (count, mean, std) arrays shaped (24 hours, 7 days)."""
+        count = np.array(self.count, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.sqrt(np.where(count > 1, np.array(self.m2) / (count - 1), np.nan))
+        return count.reshape(24, 7), np.array(self.mean).reshape(24, 7), std.reshape(24, 7)
+
+
+class IsolationForestScorer:
+    """Scores new records with the persisted IsolationForest, without refitting."""
+
+    def __init__(self, model_path=ISOLATION_FOREST_PATH, model=None):
+        self.model = model if model is not None else load_artifact(model_path)
+
+    def _matrix(self, volumes, hours):
+        return np.column_stack([np.asarray(volumes, dtype=np.float64), np.asarray(hours, dtype=np.float64)])
+
+    def decision_function(self, volumes, hours):
+        """Higher is more normal; negative values are anomalies."""
+        with warnings.catch_warnings():
+            # Fitted on a DataFrame of (traffic_volume, hour); the matrix uses the same order
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            return self.model.decision_function(self._matrix(volumes, hours))
+
+    def is_anomaly(self, volumes, hours):
+        return self.decision_function(volumes, hours) < 0
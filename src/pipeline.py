@@ -0,0 +1,278 @@
+"""Single entry point for the full pipeline, run as a DAG of cached stages.
+
+    extract -> preprocess -> cluster  \\
+                          -> anomaly   -> enhance -> aggregate
+                          -> regressor
+
+Each stage is keyed by a hash of its inputs and parameters in the manifest and
+skipped while the key is unchanged and its outputs exist. Ready stages run in a
+process pool, so clustering, anomaly detection and the regressor train
+concurrently. Every stage runs in a fresh worker process, which makes its peak
+RSS a per-stage figure; timings and peak memory are printed and appended to
+data/processed/pipeline_runs.jsonl. One process per stage relies on
+`max_tasks_per_child`, which needs Python 3.11 or newer.
+
+Run from the project root:  python -m src.pipeline [--force] [--workers N]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import pandas as pd
+from src.manifest import load_manifest, save_manifest, inputs_hash, stage_is_current, record_stage
+from src.storage import PROCESSED_DATA_PATH, PROCESSED_STEM, ENHANCED_STEM, dataset_path, load_dataset, save_dataset
+from src.preprocessing import RAW_DATA_PATH, LABEL_ENCODER_PATH
+from src.clustering import KMEANS_PATH
+from src.mining import RF_MODEL_PATH, MODEL_VARIANTS
+from src.online_anomaly import ISOLATION_FOREST_PATH
+from src.aggregates import CUBE_STEM, SKETCH_STEM, data_version
+from src.instrumentation import span, peak_rss_mb
+
+CLUSTERS_STEM = os.path.join(PROCESSED_DATA_PATH, "traffic_clusters")
+ANOMALIES_STEM = os.path.join(PROCESSED_DATA_PATH, "traffic_anomalies")
+RUN_LOG_PATH = os.path.join(PROCESSED_DATA_PATH, "pipeline_runs.jsonl")
+
+DEFAULT_PARAMS = {
+    'chunksize': None,
+    'cluster_engine': 'kmeans',
+    'clusters': '4',
+    'contamination': 0.01,
+    'variant': 'full',
+    'compress': 0,
+    'compact': False,
+}
+
+
+# Stage bodies. They run in worker processes, so they take plain parameters,
+# never touch the manifest (except extract, which runs alone) and return small results.
+
+def _extract(params):
+    from src.data_loader import download_data
+    download_data()
+
+
+def _preprocess(params):
+    from src.preprocessing import load_and_preprocess, stream_preprocess
+    if params['chunksize']:
+        result = stream_preprocess(chunksize=params['chunksize'])
+    else:
+        result = load_and_preprocess()
+    if result is None:
+        raise RuntimeError("Preprocessing produced no data")
+
+
+def _cluster(params):
+    from src.mining import TrafficMiner
+    from src.clustering import CLUSTER_FEATURES
+    miner = TrafficMiner()
+    miner.load_data(columns=CLUSTER_FEATURES)
+    clusters = params['clusters']
+    miner.train_clustering(n_clusters=None if clusters == 'auto' else int(clusters), engine=params['cluster_engine'])
+    save_dataset(miner.df[['cluster']], CLUSTERS_STEM)
+
+
+def _anomaly(params):
+    from src.mining import TrafficMiner
+    miner = TrafficMiner()
+    miner.load_data(columns=['traffic_volume', 'hour'])
+    miner.detect_anomalies(contamination=params['contamination'])
+    save_dataset(miner.df[['anomaly', 'is_anomaly']], ANOMALIES_STEM)
+
+
+def _regressor(params):
+    from src.mining import TrafficMiner
+    miner = TrafficMiner()
+    miner.load_data(compact=params['compact'])
+    return miner.train_prediction_model(variant=params['variant'], compress=params['compress'])
+
+
+def _enhance(params):
+    processed = load_dataset(PROCESSED_STEM)
+    labels = [load_dataset(CLUSTERS_STEM), load_dataset(ANOMALIES_STEM)]
+    if any(len(frame) != len(processed) for frame in labels):
+        raise RuntimeError("Stage outputs do not match the processed data; rerun with --force")
+    save_dataset(pd.concat([processed] + labels, axis=1), ENHANCED_STEM)
+
+
+def _aggregate(params):
+    from src.aggregates import CUBE_DIMENSIONS, SKETCH_DIMENSIONS, TrafficCube
+    columns = list(dict.fromkeys(CUBE_DIMENSIONS + SKETCH_DIMENSIONS + ['traffic_volume', 'is_anomaly']))
+    TrafficCube.build(load_dataset(ENHANCED_STEM, columns=columns)).save()
+
+
+class Stage:
+    """A pipeline step: its dependencies, the files its key is computed from, and its outputs.
+
+    The key hashes `inputs` and the `params` it uses; `key` overrides that (None means
+    the stage always runs and handles its own caching). `outputs` are file paths or
+    dataset stems that must exist for the stage to be skipped.
+    """
+
+    def __init__(self, name, func, deps=(), inputs=(), params=(), outputs=(), key=None):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.inputs = tuple(inputs)
+        self.params = tuple(params)
+        self.outputs = tuple(outputs)
+        self._key = key
+
+    def key(self, manifest, params):
+        if self._key is not None:
+            return self._key(manifest, params)
+        if not self.inputs:
+            return None
+        paths = [dataset_path(path) if not os.path.splitext(path)[1] else path for path in self.inputs]
+        return inputs_hash(paths, {p: params[p] for p in self.params}, manifest)
+
+    def outputs_exist(self):
+        return all(os.path.exists(path) or os.path.exists(dataset_path(path)) for path in self.outputs)
+
+
+STAGES = [
+    Stage("extract", _extract),
+    # Same key as `python -m src.preprocessing`, so either entry point sees the other's work
+    Stage("preprocess", _preprocess, deps=["extract"], inputs=[RAW_DATA_PATH],
+          outputs=[PROCESSED_STEM, LABEL_ENCODER_PATH]),
+    Stage("cluster", _cluster, deps=["preprocess"], inputs=[PROCESSED_STEM],
+          params=['cluster_engine', 'clusters'], outputs=[KMEANS_PATH, CLUSTERS_STEM]),
+    Stage("anomaly", _anomaly, deps=["preprocess"], inputs=[PROCESSED_STEM],
+          params=['contamination'], outputs=[ISOLATION_FOREST_PATH, ANOMALIES_STEM]),
+    Stage("regressor", _regressor, deps=["preprocess"], inputs=[PROCESSED_STEM],
+          params=['variant', 'compress', 'compact'], outputs=[RF_MODEL_PATH]),
+    Stage("enhance", _enhance, deps=["cluster", "anomaly"], inputs=[PROCESSED_STEM, CLUSTERS_STEM, ANOMALIES_STEM],
+          outputs=[ENHANCED_STEM]),
+    # Keyed by the cube's data version, which is what the dashboard checks
+    Stage("aggregate", _aggregate, deps=["enhance"], key=lambda manifest, params: data_version(ENHANCED_STEM, manifest),
+          outputs=[CUBE_STEM, SKETCH_STEM]),
+]
+STAGE_FUNCS = {stage.name: stage.func for stage in STAGES}
+
+
+def _run_stage(name, params):
+    """Runs one stage in a worker; returns (result, seconds, peak RSS in MB)."""
+    start = time.perf_counter()
+    with span(f"pipeline.{name}"):
+        result = STAGE_FUNCS[name](params)
+    return result, time.perf_counter() - start, peak_rss_mb()
+
+
+def _check_dag(stages):
+    names = set()
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in names]
+        if missing:
+            raise ValueError(f"Stage {stage.name!r} depends on {missing}, which are not declared before it")
+        names.add(stage.name)
+
+
+def run_pipeline(params=None, force=False, force_stages=(), workers=None, stages=STAGES, log_path=RUN_LOG_PATH):
+    """Runs the stage DAG, skipping stages whose inputs are unchanged.
+
+    `force` reruns every stage, `force_stages` only the named ones (stages downstream
+    of a rerun stage rerun when its outputs change). Returns the per-stage report.
+    """
+    _check_dag(stages)
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    pending = {stage.name: stage for stage in stages}
+    report = {}
+    started = datetime.now()
+    wall_start = time.perf_counter()
+
+    def finish(stage, status, key=None, seconds=None, peak_mb=None, result=None, error=None):
+        if status == "ran" and key is not None:
+            manifest = load_manifest()
+            record_stage(manifest, stage.name, key)
+            save_manifest(manifest)
+        report[stage.name] = {'status': status, 'seconds': seconds, 'peak_rss_mb': peak_mb,
+                              'result': result, 'error': error}
+        print(f"[{stage.name}] {status}" + (f" in {seconds:.2f}s" if seconds is not None else "")
+              + (f": {error}" if error else ""))
+
+    # A fresh process per stage keeps peak RSS per stage. max_tasks_per_child (Python 3.11+)
+    # replaces each worker after one stage; spawned workers do not inherit the parent's memory
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             max_tasks_per_child=1) as pool:
+        running = {}
+        while pending or running:
+            progressed = True
+            while progressed:
+                progressed = False
+                for name, stage in list(pending.items()):
+                    states = [report.get(dep, {}).get('status') for dep in stage.deps]
+                    if any(state in ("failed", "blocked") for state in states):
+                        del pending[name]
+                        finish(stage, "blocked")
+                        progressed = True
+                        continue
+                    if not all(state in ("ran", "skipped") for state in states):
+                        continue
+
+                    del pending[name]
+                    progressed = True
+                    manifest = load_manifest()
+                    key = stage.key(manifest, params)
+                    save_manifest(manifest)
+                    rerun = force or name in force_stages
+                    if key is not None and not rerun and stage_is_current(manifest, name, key) and stage.outputs_exist():
+                        finish(stage, "skipped")
+                    else:
+                        print(f"[{name}] running...")
+                        running[pool.submit(_run_stage, name, params)] = (stage, key)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, key = running.pop(future)
+                try:
+                    result, seconds, peak_mb = future.result()
+                except Exception as e:
+                    finish(stage, "failed", error=f"{type(e).__name__}: {e}")
+                else:
+                    finish(stage, "ran", key, seconds, peak_mb, result)
+
+    total = time.perf_counter() - wall_start
+    print_report(report, total)
+    if log_path:
+        with open(log_path, "a") as f:
+            f.write(json.dumps({'started': started.isoformat(timespec='seconds'), 'wall_seconds': total,
+                                'params': params, 'stages': report}, default=str) + "\n")
+    return report
+
+
+def print_report(report, total):
+    print(f"\n{'stage':<11} {'status':<8} {'seconds':>9} {'peak MB':>9}")
+    for name, entry in report.items():
+        seconds = f"{entry['seconds']:.2f}" if entry['seconds'] is not None else "-"
+        peak = f"{entry['peak_rss_mb']:.0f}" if entry['peak_rss_mb'] is not None else "-"
+        print(f"{name:<11} {entry['status']:<8} {seconds:>9} {peak:>9}")
+    print(f"Wall time: {total:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--force", action="store_true", help="Rerun every stage.")
+    parser.add_argument("--force-stage", action="append", default=[], choices=list(STAGE_FUNCS),
+                        help="Rerun this stage (repeatable).")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--chunksize", type=int, default=None, help="Stream preprocessing in chunks of this many rows.")
+    parser.add_argument("--cluster-engine", choices=["kmeans", "minibatch"], default="kmeans")
+    parser.add_argument("--clusters", default="4", help="Number of clusters, or 'auto' (minibatch engine only).")
+    parser.add_argument("--variant", choices=list(MODEL_VARIANTS), default="full", help="Regressor variant to train.")
+    parser.add_argument("--compress", type=int, default=0, help="joblib compression level for the regressor.")
+    parser.add_argument("--compact", action="store_true",
+                        help="Train the regressor on a downcast frame and float32 matrix views.")
+    args = parser.parse_args()
+    if args.clusters == 'auto' and args.cluster_engine != 'minibatch':
+        parser.error("--clusters auto requires --cluster-engine minibatch")
+
+    report = run_pipeline(
+        params={'chunksize': args.chunksize, 'cluster_engine': args.cluster_engine, 'clusters': args.clusters,
+                'variant': args.variant, 'compress': args.compress, 'compact': args.compact},
+        force=args.force, force_stages=args.force_stage, workers=args.workers)
+    sys.exit(1 if any(entry['status'] in ("failed", "blocked") for entry in report.values()) else 0)
@@ -0,0 +1,199 @@
+import os
+import copy
+import time
+import argparse
+import warnings
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from src.features import MODEL_FEATURES, weekend_flag
+from src.storage import load_dataset, save_dataset
+from src.artifacts import load_artifact
+from src.inference import HAS_NUMBA, FlatForest, PredictionCache
+
+MODELS_DIR = os.path.join("data", "models")
+RF_MODEL_PATH = os.path.join(MODELS_DIR, "rf_traffic_predictor.pkl")
+LABEL_ENCODER_PATH = os.path.join("data", "processed", "weather_encoder.pkl")
+# Extensions score/score_file read and write; storage picks the format from them
+DATASET_EXTENSIONS = ('.csv', '.parquet')
+
+# Example weather scenarios for grid scoring
+WEATHER_SCENARIOS = {
+    'clear': {'weather_main': 'Clear', 'weather_description': 'sky is clear', 'temp': 290.0,
+              'rain_1h': 0.0, 'snow_1h': 0.0, 'clouds_all': 0},
+    'rain': {'weather_main': 'Rain', 'weather_description': 'moderate rain', 'temp': 285.0,
+             'rain_1h': 2.5, 'snow_1h': 0.0, 'clouds_all': 90},
+    'snow': {'weather_main': 'Snow', 'weather_description': 'heavy snow', 'temp': 265.0,
+             'rain_1h': 0.0, 'snow_1h': 0.5, 'clouds_all': 90},
+}
+
+
+def file_stamp(path):
+    """(size, mtime_ns) of a file, or None when it does not exist."""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def scenario_grid(scenarios=None, month=6):
+    """Builds a 24 (hours) x 7 (days) grid of rows for every weather scenario."""
+    scenarios = scenarios or WEATHER_SCENARIOS
+    hours, days = np.meshgrid(np.arange(24), np.arange(7), indexing='ij')
+    frames = []
+    for name, weather in scenarios.items():
+        frame = pd.DataFrame({'scenario': name, 'hour': hours.ravel(), 'day_of_week': days.ravel(), 'month': month})
+        for col, value in weather.items():
+            frame[col] = value
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+class TrafficPredictor:
+    """Batch traffic volume predictor around the trained Random Forest.
+
+    Loads the model and weather encoders once; categoricals are encoded through
+    precomputed lookups and large batches are predicted in parallel chunks.
+
+    With `fast_path_rows`, batches of up to that many rows are scored on a flattened
+    copy of the forest (src.inference.FlatForest), avoiding sklearn's per-call
+    overhead; with numba installed the flat forest scores every batch. `cache_size`
+    adds an LRU cache of predictions keyed by the exact feature rows (or by rows rounded
+    to `cache_decimals`, which shares predictions between nearby rows).
+
+    `model_stamp` identifies the model that was loaded (the file's size and mtime at
+    load time), so results cached elsewhere can be tied to it; it is None for a
+    model passed in as an object. A passed-in model is not modified: when its `n_jobs`
+    has to change, the predictor uses a shallow copy that shares the fitted trees.
+    """
+
+    def __init__(self, model_path=RF_MODEL_PATH, encoder_path=LABEL_ENCODER_PATH, n_jobs=1, chunk_size=50_000,
+                 model=None, encoders=None, fast_path_rows=0, cache_size=0, cache_decimals=None):
+        self.model_stamp = None
+        owns_model = model is None
+        if model is None:
+            stamp = file_stamp(model_path)
+            model = load_artifact(model_path)
+            # A file replaced while it was loading cannot be identified
+            if file_stamp(model_path) == stamp:
+                self.model_stamp = stamp
+        self.model = model
+        self.encoders = encoders if encoders is not None else load_artifact(encoder_path)
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
+        self.fast_path_rows = fast_path_rows
+        self.forest = None
+        if fast_path_rows:
+            try:
+                self.forest = FlatForest.from_model(self.model)
+            except ValueError:
+                pass # not a tree forest (e.g. hist_gb): always use the model
+        self.cache = PredictionCache(cache_size, cache_decimals) if cache_size else None
+        # Parallelism is handled here, per chunk; avoid nested thread pools inside the forest
+        if getattr(self.model, 'n_jobs', 1) != 1:
+            if not owns_model:
+                self.model = copy.copy(self.model)
+            self.model.n_jobs = 1
+        self._classes = {
+            'weather_main': pd.Index(self.encoders['main'].classes_),
+            'weather_description': pd.Index(self.encoders['desc'].classes_),
+        }
+
+    def _encode(self, values, col):
+        codes = self._classes[col].get_indexer(np.asarray(values, dtype=object))
+        if (codes < 0).any():
+            unseen = sorted(set(np.asarray(values, dtype=object)[codes < 0]))
+            raise ValueError(f"{col} contains previously unseen labels: {unseen}")
+        return codes
+
+    def feature_matrix(self, X):
+        """Returns a contiguous float32 matrix with the MODEL_FEATURES columns.
+
+        DataFrames may give weather either as codes or as `weather_main` /
+        `weather_description` labels; `is_weekend` is derived when missing.
+        Arrays must already be in MODEL_FEATURES order.
+        """
+        if not isinstance(X, pd.DataFrame):
+            X = np.ascontiguousarray(X, dtype=np.float32)
+            if X.ndim != 2 or X.shape[1] != len(MODEL_FEATURES):
+                raise ValueError(f"Expected an array of shape (n, {len(MODEL_FEATURES)})")
+            return X
+
+        matrix = np.empty((len(X), len(MODEL_FEATURES)), dtype=np.float32)
+        for i, col in enumerate(MODEL_FEATURES):
+            if col in X.columns:
+                matrix[:, i] = X[col].to_numpy()
+            elif col == 'is_weekend':
+                matrix[:, i] = weekend_flag(X['day_of_week'])
+            elif col.endswith('_code') and col[:-len('_code')] in X.columns:
+                matrix[:, i] = self._encode(X[col[:-len('_code')]], col[:-len('_code')])
+            else:
+                raise KeyError(f"Missing feature column: {col}")
+        return matrix
+
+    def predict(self, X):
+        """Predicts traffic volume for a DataFrame or (n, n_features) array."""
+        matrix = self.feature_matrix(X)
+        if self.cache is not None:
+            return self.cache.predict(matrix, self._predict_matrix)
+        return self._predict_matrix(matrix)
+
+    def _predict_matrix(self, matrix):
+        if self.forest is not None and (HAS_NUMBA or len(matrix) <= self.fast_path_rows):
+            return self.forest.predict(matrix)
+        with warnings.catch_warnings():
+            # The model was fitted on a DataFrame; columns are already in MODEL_FEATURES order
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            if len(matrix) <= self.chunk_size or self.n_jobs == 1:
+                return self.model.predict(matrix)
+
+            chunks = [matrix[start:start + self.chunk_size] for start in range(0, len(matrix), self.chunk_size)]
+            # Tree prediction releases the GIL, so threads avoid copying the model to workers
+            results = Parallel(n_jobs=self.n_jobs, prefer="threads")(delayed(self.model.predict)(chunk) for chunk in chunks)
+        return np.concatenate(results)
+
+
+def score(df, output_path, n_jobs=1):
+    """Scores a frame of scenarios and writes it, with a `predicted_volume` column, to `output_path` (.csv or .parquet)."""
+    out_stem, out_ext = os.path.splitext(output_path)
+    if out_ext not in DATASET_EXTENSIONS:
+        raise ValueError(f"Output must be a .csv or .parquet file, got {output_path}")
+    predictor = TrafficPredictor(n_jobs=n_jobs)
+    start = time.perf_counter()
+    df['predicted_volume'] = predictor.predict(df)
+    elapsed = time.perf_counter() - start
+    save_dataset(df, out_stem, fmt=out_ext.lstrip('.'))
+    print(f"Scored {len(df):,} rows in {elapsed * 1000:.1f} ms ({elapsed * 1e6 / max(len(df), 1):.1f} ms per 1000 rows)")
+    return df
+
+
+def score_file(input_path, output_path, n_jobs=1):
+    """Scores a CSV or Parquet file of scenarios."""
+    stem, ext = os.path.splitext(input_path)
+    df = load_dataset(stem, fmt=ext.lstrip('.'))
+    if df is None:
+        print(f"Error: {input_path} not found.")
+        return None
+    return score(df, output_path, n_jobs=n_jobs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch traffic volume prediction.")
+    parser.add_argument("input", nargs="?", help="CSV or Parquet file of scenarios to score.")
+    parser.add_argument("-o", "--output", default=os.path.join("data", "processed", "predictions.csv"),
+                        help="Output .csv or .parquet file.")
+    parser.add_argument("--grid", action="store_true",
+                        help="Score a 24x7 hour/day grid for each built-in weather scenario instead.")
+    parser.add_argument("--n-jobs", type=int, default=1)
+    args = parser.parse_args()
+    if os.path.splitext(args.output)[1] not in DATASET_EXTENSIONS:
+        parser.error(f"--output must end in .csv or .parquet: {args.output}")
+    if args.input and os.path.splitext(args.input)[1] not in DATASET_EXTENSIONS:
+        parser.error(f"The input must be a .csv or .parquet file: {args.input}")
+
+    if args.grid:
+        score(scenario_grid(), args.output, n_jobs=args.n_jobs)
+    elif args.input:
+        score_file(args.input, args.output, n_jobs=args.n_jobs)
+    else:
+        parser.error("Pass an input file or --grid.")
@@ -1,69 +1,275 @@
 import pandas as pd
 import numpy as np
 import os
-from sklearn.preprocessing import LabelEncoder
+import shutil
+import tempfile
+import argparse
 import joblib
+from src.storage import PROCESSED_STEM, HAS_PYARROW, save_dataset, append_dataset, dataset_path, optimize_dtypes
+from src.features import TIME_SLOTS, build_features, encode_weather
+from src.manifest import load_manifest, save_manifest, inputs_hash, stage_is_current, record_stage
+from src.instrumentation import timed
 
 RAW_DATA_PATH = os.path.join("data", "raw", "Metro_Interstate_Traffic_Volume.csv")
-PROCESSED_DATA_PATH = os.path.join("data", "processed")
-PROCESSED_FILE = os.path.join(PROCESSED_DATA_PATH, "traffic_processed.csv")
 LABEL_ENCODER_PATH = os.path.join("data", "processed", "weather_encoder.pkl")
 
-def load_and_preprocess():
-    """Loads raw data, cleans it, performs feature engineering, and saves processed data."""
-    if not os.path.exists(RAW_DATA_PATH):
-        print(f"Error: Raw data not found at {RAW_DATA_PATH}. Run data_loader.py first.")
-        return None
+# Read free-text columns as strings even when a chunk holds only missing values
+RAW_DTYPES = {'holiday': 'str', 'weather_main': 'str', 'weather_description': 'str'}
+DEFAULT_CHUNKSIZE = 100_000
 
-    print("Loading raw data...")
-    df = pd.read_csv(RAW_DATA_PATH)
-    
+
+def fit_weather_encoders(main_values, desc_values):
+    from sklearn.preprocessing import LabelEncoder
+
+    le_main = LabelEncoder().fit(np.asarray(list(main_values), dtype=object))
+    le_desc = LabelEncoder().fit(np.asarray(list(desc_values), dtype=object))
+    return {'main': le_main, 'desc': le_desc}
+
+
+def save_encoders(encoders, path=LABEL_ENCODER_PATH):
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    joblib.dump(encoders, path)
+
+
+@timed("preprocessing.preprocess_frame", rows=lambda result, df: len(result[0]))
+def preprocess_frame(df):
+    """Cleans and feature-engineers a raw frame; returns (processed frame, fitted weather encoders)."""
     # 1. Date Conversion
     print("Converting dates...")
     df['date_time'] = pd.to_datetime(df['date_time'])
-    
-    # 2. Sorting
-    df = df.sort_values('date_time').reset_index(drop=True)
-    
+
+    # 2. Sorting (stable, so the first record of a duplicated timestamp is the one kept)
+    df = df.sort_values('date_time', kind='stable').reset_index(drop=True)
+
     # 3. Feature Engineering
     print("Feature engineering...")
-    df['hour'] = df['date_time'].dt.hour
-    df['day_of_week'] = df['date_time'].dt.dayofweek # 0=Monday, 6=Sunday
-    df['month'] = df['date_time'].dt.month
-    df['year'] = df['date_time'].dt.year
-    df['is_weekend'] = df['day_of_week'].apply(lambda x: 1 if x >= 5 else 0)
-    
-    # Categorize hours into time slots
-    def get_time_slot(h):
-        if 6 <= h < 10: return 'Morning Rush'
-        elif 10 <= h < 16: return 'Work Hours'
-        elif 16 <= h < 20: return 'Evening Rush'
-        else: return 'Off Peak'
-    
-    df['time_slot'] = df['hour'].apply(get_time_slot)
-    
+    df = build_features(df)
+
     # 4. Encoding Categorical Data
     print("Encoding categorical features...")
-    le_main = LabelEncoder()
-    df['weather_main_code'] = le_main.fit_transform(df['weather_main'])
-    
-    le_desc = LabelEncoder()
-    df['weather_description_code'] = le_desc.fit_transform(df['weather_description'])
-    
-    # Save Encoders for future inference if needed
-    if not os.path.exists(PROCESSED_DATA_PATH):
-        os.makedirs(PROCESSED_DATA_PATH)
-        
-    joblib.dump({'main': le_main, 'desc': le_desc}, LABEL_ENCODER_PATH)
-    
+    encoders = fit_weather_encoders(df['weather_main'].unique(), df['weather_description'].unique())
+    df = encode_weather(df, encoders)
+
     # 5. Handling Duplicates (if any)
-    df = df.drop_duplicates(subset=['date_time'], keep='first')
-    
+    df = df.drop_duplicates(subset=['date_time'], keep='first').reset_index(drop=True)
+    return df, encoders
+
+
+@timed("preprocessing.load_and_preprocess", rows=lambda result, *args, **kwargs: len(result) if result is not None else 0)
+def load_and_preprocess(raw_path=RAW_DATA_PATH, output_stem=PROCESSED_STEM, encoder_path=LABEL_ENCODER_PATH):
+    """Loads raw data, cleans it, performs feature engineering, and saves processed data."""
+    if not os.path.exists(raw_path):
+        print(f"Error: Raw data not found at {raw_path}. Run data_loader.py first.")
+        return None
+
+    print("Loading raw data...")
+    df, encoders = preprocess_frame(pd.read_csv(raw_path, dtype=RAW_DTYPES))
+
+    # Save Encoders for future inference if needed
+    save_encoders(encoders, encoder_path)
+
     # 6. Save Processed Data
-    print(f"Saving processed data to {PROCESSED_FILE}...")
-    df.to_csv(PROCESSED_FILE, index=False)
+    print(f"Saving processed data to {output_stem}...")
+    path = save_dataset(df, output_stem)
+    print(f"Saved {path}")
     print("Preprocessing complete.")
     return df
 
+
+@timed("preprocessing.preprocess_increment", rows=lambda result, *args, **kwargs: len(result))
+def preprocess_increment(raw_df, watermark=None, output_stem=PROCESSED_STEM, encoder_path=LABEL_ENCODER_PATH):
+    """Preprocesses only raw rows newer than `watermark` and appends them to the processed store.
+
+    Uses the saved weather encoders, so codes stay consistent with earlier rows; an unseen
+    weather label raises ValueError (the caller should then rebuild from scratch).
+    Returns the appended rows.
+    """
+    encoders = joblib.load(encoder_path)
+    df = raw_df.copy()
+    df['date_time'] = pd.to_datetime(df['date_time'])
+    if watermark is not None:
+        df = df[df['date_time'] > pd.Timestamp(watermark)]
+    df = df.sort_values('date_time', kind='stable')
+    df = df.drop_duplicates(subset=['date_time'], keep='first').reset_index(drop=True)
+    if not len(df):
+        return df
+
+    df = build_features(df, encoders)
+    append_dataset(df, output_stem)
+    return df
+
+
+class _RunReader:
+    """Reads a sorted run back in blocks of `block_size` rows."""
+
+    def __init__(self, path, block_size):
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+            batches = pq.ParquetFile(path).iter_batches(batch_size=block_size)
+            self._blocks = (batch.to_pandas() for batch in batches)
+        else:
+            self._blocks = pd.read_csv(path, chunksize=block_size, dtype=RAW_DTYPES, parse_dates=['date_time'])
+        self.buffer = None
+        self.exhausted = False
+
+    def refill(self):
+        if self.exhausted or (self.buffer is not None and len(self.buffer)):
+            return
+        block = next(self._blocks, None)
+        if block is None:
+            self.exhausted = True
+            self.buffer = None
+        else:
+            self.buffer = block
+
+    @property
+    def last_key(self):
+        return self.buffer['date_time'].iloc[-1]
+
+
+class _OutputWriter:
+    """Appends processed batches to Parquet (or CSV) without holding the full result."""
+
+    def __init__(self, stem):
+        self.path = dataset_path(stem, "parquet" if HAS_PYARROW else "csv")
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._writer = None
+        self._schema = None
+        self.rows = 0
+
+    def write(self, df):
+        if not len(df):
+            return
+        df = optimize_dtypes(df)
+        if self.path.endswith(".parquet"):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode='a', header=self.rows == 0, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _write_run(df, run_dir, run_id, block_size):
+    if HAS_PYARROW:
+        path = os.path.join(run_dir, f"run_{run_id:05d}.parquet")
+        df.to_parquet(path, index=False, row_group_size=block_size)
+    else:
+        path = os.path.join(run_dir, f"run_{run_id:05d}.csv")
+        df.to_csv(path, index=False)
+    return path
+
+
+def _finalize_batch(batch, encoders, last_key):
+    """Orders a merged batch, drops duplicate timestamps and encodes weather."""
+    batch = batch.sort_values(['date_time', '_seq'], kind='stable')
+    batch = batch.drop_duplicates(subset=['date_time'], keep='first')
+    if last_key is not None:
+        batch = batch[batch['date_time'] != last_key]
+    batch = batch.drop(columns='_seq').reset_index(drop=True)
+    batch['time_slot'] = pd.Categorical(batch['time_slot'], categories=TIME_SLOTS)
+    return encode_weather(batch, encoders)
+
+
+@timed("preprocessing.stream_preprocess")
+def stream_preprocess(raw_path=RAW_DATA_PATH, output_stem=PROCESSED_STEM, encoder_path=LABEL_ENCODER_PATH,
+                      chunksize=DEFAULT_CHUNKSIZE, tmp_dir=None):
+    """Preprocesses a raw file larger than memory, holding about `chunksize` rows at a time.
+
+    Pass 1 reads the raw CSV in chunks, derives time features, collects the weather
+    vocabulary and writes each chunk as a sorted run. Pass 2 merges the runs block by
+    block, drops duplicate timestamps and appends the encoded rows to the output.
+    The result is identical to `load_and_preprocess`.
+    """
+    if not os.path.exists(raw_path):
+        print(f"Error: Raw data not found at {raw_path}. Run data_loader.py first.")
+        return None
+
+    run_dir = tempfile.mkdtemp(prefix="traffic_runs_", dir=tmp_dir)
+    try:
+        # Pass 1: sorted runs + shared categorical vocabulary
+        print(f"Writing sorted runs of {chunksize:,} rows...")
+        main_vocab, desc_vocab = set(), set()
+        run_paths = []
+        offset = 0
+        for chunk in pd.read_csv(raw_path, chunksize=chunksize, dtype=RAW_DTYPES):
+            chunk['date_time'] = pd.to_datetime(chunk['date_time'])
+            chunk['_seq'] = np.arange(offset, offset + len(chunk), dtype=np.int64)
+            offset += len(chunk)
+            chunk = build_features(chunk)
+            main_vocab.update(chunk['weather_main'].unique())
+            desc_vocab.update(chunk['weather_description'].unique())
+            chunk = chunk.sort_values(['date_time', '_seq'], kind='stable')
+            run_paths.append(_write_run(chunk, run_dir, len(run_paths), chunksize))
+
+        encoders = fit_weather_encoders(main_vocab, desc_vocab)
+        save_encoders(encoders, encoder_path)
+
+        # Pass 2: k-way block merge, memory bounded by ~chunksize rows across all runs
+        print(f"Merging {len(run_paths)} runs...")
+        block_size = max(1, chunksize // max(1, len(run_paths)))
+        readers = [_RunReader(path, block_size) for path in run_paths]
+        writer = _OutputWriter(output_stem)
+        last_key = None
+        try:
+            while True:
+                for reader in readers:
+                    reader.refill()
+                active = [r for r in readers if not r.exhausted]
+                if not active:
+                    break
+                # Every run has buffered all of its rows up to the smallest buffered tail
+                threshold = min(r.last_key for r in active)
+                parts = []
+                for reader in active:
+                    keys = reader.buffer['date_time']
+                    cut = int(keys.searchsorted(threshold, side='right'))
+                    parts.append(reader.buffer.iloc[:cut])
+                    reader.buffer = reader.buffer.iloc[cut:]
+                batch = _finalize_batch(pd.concat(parts, ignore_index=True), encoders, last_key)
+                if len(batch):
+                    last_key = batch['date_time'].iloc[-1]
+                writer.write(batch)
+        finally:
+            writer.close()
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    print(f"Saved {writer.rows:,} rows to {writer.path}")
+    print("Preprocessing complete.")
+    return writer.path
+
+
 if __name__ == "__main__":
-    load_and_preprocess()
+    parser = argparse.ArgumentParser(description="Preprocess raw traffic data.")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Stream the raw file in chunks of this many rows (bounded memory).")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the raw data is unchanged.")
+    args = parser.parse_args()
+
+    manifest = load_manifest()
+    key = inputs_hash([RAW_DATA_PATH], manifest=manifest)
+    if not args.force and stage_is_current(manifest, "preprocess", key) and os.path.exists(dataset_path(PROCESSED_STEM)):
+        print("Raw data unchanged since last run; skipping preprocessing.")
+    else:
+        if args.chunksize:
+            result = stream_preprocess(chunksize=args.chunksize)
+        else:
+            result = load_and_preprocess()
+        if result is not None:
+            record_stage(manifest, "preprocess", key)
+    save_manifest(manifest)
@@ -0,0 +1,151 @@
+"""DuckDB query layer for dashboard aggregates.
+
+The processed/enhanced dataset (Parquet, or CSV fallback) is registered as the
+`traffic` view; each query aggregates inside DuckDB with the year filter pushed
+down to the scan, so only small result frames reach pandas.
+"""
+import os
+import duckdb
+import pandas as pd
+from src.storage import ENHANCED_STEM, dataset_path
+
+CORRELATION_COLUMNS = ['traffic_volume', 'temp', 'rain_1h', 'snow_1h', 'clouds_all', 'hour']
+
+
+def connect(stem=ENHANCED_STEM, database=":memory:"):
+    """Opens a DuckDB connection with the dataset registered as view `traffic` (None if missing)."""
+    path = dataset_path(stem)
+    if not os.path.exists(path):
+        return None
+    con = duckdb.connect(database)
+    reader = "read_parquet" if path.endswith(".parquet") else "read_csv_auto"
+    # Views cannot take parameters, so the path is inlined as a quoted literal
+    literal = "'" + os.path.abspath(path).replace("'", "''") + "'"
+    con.execute(f"CREATE OR REPLACE VIEW traffic AS SELECT * FROM {reader}({literal})")
+    return con
+
+
+def _year_filter(years):
+    """WHERE clause and parameters restricting to `years` (all years when empty)."""
+    if not years:
+        return "", []
+    return f"WHERE year IN ({', '.join('?' * len(years))})", [int(y) for y in years]
+
+
+def years(con):
+    """Sorted list of years present."""
+    return [row[0] for row in con.execute("SELECT DISTINCT year FROM traffic ORDER BY year").fetchall()]
+
+
+def summary(con, years=None):
+    """One-row frame: records, avg_volume, anomalies."""
+    where, params = _year_filter(years)
+    return con.execute(f"""
+        SELECT count(*) AS records,
+               avg(traffic_volume) AS avg_volume,
+               count(*) FILTER (WHERE is_anomaly) AS anomalies
+        FROM traffic {where}
+    """, params).df()
+
+
+def hourly_by_weekday(con, years=None):
+    """Columns hour, day_of_week, traffic_volume (mean), records."""
+    where, params = _year_filter(years)
+    return con.execute(f"""
+        SELECT hour, day_of_week, avg(traffic_volume) AS traffic_volume, count(*) AS records
+        FROM traffic {where}
+        GROUP BY hour, day_of_week
+        ORDER BY day_of_week, hour
+    """, params).df()
+
+
+def weather_box_stats(con, years=None, top_n=10):
+    """Box plot statistics for the `top_n` most frequent weather descriptions.
+
+    Columns weather_description, records, q1, median, q3, whislo, whishi (1.5 IQR
+    whiskers clipped to the data range), ordered by frequency.
+    """
+    where, params = _year_filter(years)
+    return con.execute(f"""
+        WITH top AS (
+            SELECT weather_description, count(*) AS records
+            FROM traffic {where}
+            GROUP BY weather_description
+            ORDER BY records DESC, weather_description
+            LIMIT ?
+        ), stats AS (
+            SELECT t.weather_description,
+                   quantile_cont(t.traffic_volume, 0.25) AS q1,
+                   quantile_cont(t.traffic_volume, 0.5) AS median,
+                   quantile_cont(t.traffic_volume, 0.75) AS q3,
+                   min(t.traffic_volume) AS lo,
+                   max(t.traffic_volume) AS hi
+            FROM traffic t JOIN top USING (weather_description)
+            {where}
+            GROUP BY t.weather_description
+        )
+        SELECT top.weather_description, top.records, q1, median, q3,
+               greatest(lo, q1 - 1.5 * (q3 - q1)) AS whislo,
+               least(hi, q3 + 1.5 * (q3 - q1)) AS whishi
+        FROM stats JOIN top USING (weather_description)
+        ORDER BY top.records DESC, top.weather_description
+    """, params + [int(top_n)] + params).df()
+
+
+def correlation(con, years=None, columns=CORRELATION_COLUMNS):
+    """Pearson correlation matrix of `columns`, computed in DuckDB."""
+    where, params = _year_filter(years)
+    pairs = [(a, b) for i, a in enumerate(columns) for b in columns[i + 1:]]
+    select = ", ".join(f"corr({a}, {b}) AS \"{a}|{b}\"" for a, b in pairs)
+    row = con.execute(f"SELECT {select} FROM traffic {where}", params).df().iloc[0]
+    matrix = pd.DataFrame(1.0, index=columns, columns=columns)
+    for a, b in pairs:
+        matrix.loc[a, b] = matrix.loc[b, a] = row[f"{a}|{b}"]
+    return matrix
+
+
+def anomaly_counts_by_year(con, years=None):
+    """Columns year, records, anomalies."""
+    where, params = _year_filter(years)
+    return con.execute(f"""
+        SELECT year, count(*) AS records, count(*) FILTER (WHERE is_anomaly) AS anomalies
+        FROM traffic {where} GROUP BY year ORDER BY year
+    """, params).df()
+
+
+def scatter_sample(con, years=None, n=5000, columns=('hour', 'traffic_volume', 'is_anomaly', 'cluster')):
+    """Deterministic sample of about `n` rows of `columns` for scatter plots that keeps the extremes.
+
+    Keeps every anomaly (up to n / 2) and the highest- and lowest-volume record of each
+    hour; the rest is a hash-of-`date_time` Bernoulli sample of the normal rows, so every
+    (hour, cluster) stratum is represented in proportion to its size and the same filter
+    always returns the same points. Each part is one scan or aggregate (no sorts of the
+    full table), which keeps this fast on multi-million-row histories. A record picked by
+    more than one part (an anomaly that is also an hour's extreme) is returned once.
+    """
+    where, params = _year_filter(years)
+    select = ', '.join(columns)
+    # The parts carry date_time so that UNION drops repeated records, not equal-valued points
+    keyed = list(dict.fromkeys(['date_time', *columns]))
+    select_keyed = ', '.join(keyed)
+    needed = ', '.join(dict.fromkeys([*columns, 'hour', 'traffic_volume', 'is_anomaly', 'date_time']))
+    fields = ', '.join(f"{col} := {col}" for col in keyed)
+    # Volume, ties broken by the date_time hash, as one integer (cheaper to compare than a struct)
+    order_key = "traffic_volume::BIGINT * 4294967296 + (hash(date_time) % 4294967296)::BIGINT"
+    max_anomalies = int(n) // 2
+    return con.execute(f"""
+        WITH base AS (SELECT {needed} FROM traffic {where}),
+        counts AS (SELECT count(*) AS total_rows, count(*) FILTER (WHERE is_anomaly) AS anomalies FROM base)
+        SELECT {select} FROM (
+            (SELECT {select_keyed} FROM base WHERE is_anomaly ORDER BY hash(date_time) LIMIT {max_anomalies})
+            UNION
+            (SELECT unnest(arg_max(struct_pack({fields}), {order_key})) FROM base GROUP BY hour)
+            UNION
+            (SELECT unnest(arg_min(struct_pack({fields}), {order_key})) FROM base GROUP BY hour)
+            UNION
+            (SELECT {select_keyed} FROM base, counts
+             WHERE NOT is_anomaly
+               AND hash(date_time) % 1000000 < 1000000 * greatest({int(n)} - least(anomalies, {max_anomalies}) - 48, 0)
+                                                   / greatest(total_rows - anomalies, 1))
+        )
+    """, params).df()
@@ -0,0 +1,221 @@
+"""Local HTTP inference service for traffic volume prediction.
+
+    python -m src.service --port 8080
+
+POST /predict   JSON object or list of objects with the prediction inputs
+                (hour, day_of_week, month, weather_main, weather_description,
+                temp, rain_1h, snow_1h, clouds_all) -> {"predictions": [...]}
+GET  /stats     latency and throughput counters
+GET  /health    liveness check
+
+Concurrent requests are collected into micro-batches so that one `predict`
+call serves many requests.
+"""
+import time
+import json
+import asyncio
+import argparse
+from collections import deque
+import numpy as np
+import pandas as pd
+from src.prediction import TrafficPredictor, RF_MODEL_PATH, LABEL_ENCODER_PATH
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+
+class ServiceStats:
+    """Request/row/batch counters and a window of recent request latencies."""
+
+    def __init__(self, window=10_000):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=window)
+
+    def record(self, latency, rows):
+        self.requests += 1
+        self.rows += rows
+        self.latencies.append(latency)
+
+    def snapshot(self):
+        uptime = time.perf_counter() - self.started
+        latencies_ms = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        return {
+            "uptime_s": round(uptime, 3),
+            "requests": self.requests,
+            "rows": self.rows,
+            "batches": self.batches,
+            "errors": self.errors,
+            "mean_batch_rows": round(self.rows / self.batches, 2) if self.batches else 0.0,
+            "requests_per_s": round(self.requests / uptime, 2) if uptime else 0.0,
+            "rows_per_s": round(self.rows / uptime, 2) if uptime else 0.0,
+            "latency_p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+            "latency_p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        }
+
+
+class MicroBatcher:
+    """Groups concurrently submitted rows into one `predict` call.
+
+    A batch is flushed when it reaches `max_batch_rows` or `max_wait_ms` after its
+    first request, whichever comes first.
+    """
+
+    def __init__(self, predictor, stats, max_batch_rows=1024, max_wait_ms=2.0):
+        self.predictor = predictor
+        self.stats = stats
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def submit(self, matrix):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((matrix, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            rows = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+            while rows < self.max_batch_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                rows += len(item[0])
+
+            matrix = np.concatenate([batch for batch, _ in pending])
+            try:
+                # Prediction is CPU-bound; keep the event loop free to accept requests
+                predictions = await loop.run_in_executor(None, self.predictor.predict, matrix)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.stats.batches += 1
+
+            offset = 0
+            for batch, future in pending:
+                if not future.done():
+                    future.set_result(predictions[offset:offset + len(batch)].tolist())
+                offset += len(batch)
+
+
+class PredictionService:
+    def __init__(self, predictor, max_batch_rows=1024, max_wait_ms=2.0):
+        self.predictor = predictor
+        self.stats = ServiceStats()
+        self.batcher = MicroBatcher(predictor, self.stats, max_batch_rows, max_wait_ms)
+
+    async def handle_predict(self, body):
+        payload = json.loads(body)
+        records = payload if isinstance(payload, list) else [payload]
+        # Validate and encode per request so one bad request cannot fail a whole batch
+        matrix = self.predictor.feature_matrix(pd.DataFrame.from_records(records))
+        predictions = await self.batcher.submit(matrix)
+        return {"predictions": predictions}
+
+    async def dispatch(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok"}
+        if method == "GET" and path == "/stats":
+            snapshot = self.stats.snapshot()
+            if self.predictor.cache is not None:
+                snapshot["cache"] = self.predictor.cache.stats()
+            return 200, snapshot
+        if method == "POST" and path == "/predict":
+            start = time.perf_counter()
+            try:
+                result = await self.handle_predict(body)
+            except (ValueError, KeyError, TypeError) as e:
+                self.stats.errors += 1
+                return 400, {"error": str(e)}
+            self.stats.record(time.perf_counter() - start, len(result["predictions"]))
+            return 200, result
+        return 404, {"error": f"No route for {method} {path}"}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                keep_alive = headers.get("connection", "keep-alive").lower() != "close"
+                if length > MAX_BODY_BYTES:
+                    status, result = 413, {"error": "Request body too large"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, result = await self.dispatch(method, path.split("?", 1)[0], body)
+
+                payload = json.dumps(result).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8080):
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving predictions on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Traffic prediction HTTP service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--model", default=RF_MODEL_PATH)
+    parser.add_argument("--encoders", default=LABEL_ENCODER_PATH)
+    parser.add_argument("--max-batch-rows", type=int, default=1024)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--fast-path-rows", type=int, default=256,
+                        help="Score batches up to this size on the flattened forest (0 to disable).")
+    parser.add_argument("--cache-size", type=int, default=100_000, help="LRU prediction cache entries (0 to disable).")
+    args = parser.parse_args()
+
+    predictor = TrafficPredictor(args.model, args.encoders, fast_path_rows=args.fast_path_rows, cache_size=args.cache_size)
+    service = PredictionService(predictor, args.max_batch_rows, args.max_wait_ms)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,241 @@
+"""Partitioned processing for many counting stations.
+
+Raw input is CSV files with a `station_id` column in data/raw/stations/: one file per
+station, or a station's rows spread over several files (daily dumps, files holding
+several stations). Each station is preprocessed and mined independently, from the
+rows of every file that contains it, in a process pool:
+
+    data/processed/stations/station_id=<id>/year=<yyyy>/part.parquet   (or .csv)
+    data/models/<id>/{weather_encoder,kmeans_traffic,isolation_forest,rf_traffic_predictor}.pkl
+
+Stations whose raw files and parameters are unchanged are skipped (manifest keys).
+`generate_stations` derives a synthetic multi-station dataset from the Metro data
+so scaling across cores can be benchmarked locally.
+
+Run from the project root:
+    python -m src.stations generate --stations 32
+    python -m src.stations run --workers 8
+"""
+import os
+import sys
+import glob
+import time
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from src.storage import PROCESSED_DATA_PATH, load_dataset, save_dataset
+from src.manifest import MANIFEST_PATH, load_manifest, save_manifest, file_hash, inputs_hash, stage_is_current, record_stage
+from src.preprocessing import RAW_DATA_PATH, LABEL_ENCODER_PATH, RAW_DTYPES, preprocess_frame, save_encoders
+from src.mining import MODELS_DIR, MODEL_VARIANTS, TrafficMiner
+
+STATIONS_RAW_DIR = os.path.join("data", "raw", "stations")
+STATIONS_ROOT = os.path.join(PROCESSED_DATA_PATH, "stations")
+
+
+def station_models_dir(station_id, models_root=MODELS_DIR):
+    return os.path.join(models_root, str(station_id))
+
+
+def partition_stem(station_id, year, root=STATIONS_ROOT):
+    """Dataset stem of one (station, year) partition."""
+    return os.path.join(root, f"station_id={station_id}", f"year={int(year)}", "part")
+
+
+def list_stations(root=STATIONS_ROOT):
+    """Station ids with processed partitions."""
+    return sorted(os.path.basename(path).split("=", 1)[1] for path in glob.glob(os.path.join(root, "station_id=*")))
+
+
+def write_partitions(df, station_id, root=STATIONS_ROOT):
+    """Replaces a station's partitions with `df`, one dataset per year.
+
+    The station id is encoded in the path rather than stored as a column.
+    """
+    station_dir = os.path.join(root, f"station_id={station_id}")
+    if os.path.exists(station_dir):
+        shutil.rmtree(station_dir)
+    df = df.drop(columns=['station_id'], errors='ignore')
+    return [save_dataset(part, partition_stem(station_id, year, root)) for year, part in df.groupby('year', sort=True)]
+
+
+def load_station(station_id, root=STATIONS_ROOT, columns=None, years=None):
+    """Loads a station's partitions (optionally only some `years`), in time order."""
+    parts = []
+    for year_dir in sorted(glob.glob(os.path.join(root, f"station_id={station_id}", "year=*"))):
+        year = int(os.path.basename(year_dir).split("=", 1)[1])
+        if years and year not in years:
+            continue
+        part = load_dataset(os.path.join(year_dir, "part"), columns=columns)
+        if part is not None:
+            parts.append(part)
+    if not parts:
+        return None
+    df = pd.concat(parts, ignore_index=True)
+    df['station_id'] = station_id
+    return df
+
+
+def generate_stations(n_stations, output_dir=STATIONS_RAW_DIR, raw_path=RAW_DATA_PATH, seed=42):
+    """Writes `n_stations` synthetic raw station files derived from the Metro dataset.
+
+    Each station shares the Metro weather, with its own volume scale, a peak shifted
+    by up to two hours, multiplicative noise and about 1% of records dropped.
+    Returns the written paths.
+    """
+    base = pd.read_csv(raw_path, dtype=RAW_DTYPES)
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for i in range(n_stations):
+        rng = np.random.default_rng(seed + i)
+        station_id = f"S{i + 1:04d}"
+        volume = base['traffic_volume'].shift(int(rng.integers(-2, 3))).bfill().ffill()
+        volume = volume * rng.lognormal(0, 0.4) * rng.normal(1, 0.08, len(base))
+        station = base.assign(traffic_volume=volume.clip(lower=0).round().astype(np.int64))
+        station = station[rng.random(len(base)) > 0.01]
+        station.insert(0, 'station_id', station_id)
+        path = os.path.join(output_dir, f"{station_id}.csv")
+        station.to_csv(path, index=False)
+        paths.append(path)
+    print(f"Wrote {n_stations} station files ({n_stations * len(base):,} rows before drops) to {output_dir}")
+    return paths
+
+
+def file_stations(path, manifest=None):
+    """Sorted station ids in a raw file.
+
+    With a manifest they are kept with the file's hash entry, so an unchanged file is
+    not read again.
+    """
+    entry = None
+    if manifest is not None:
+        file_hash(path, manifest) # replaces the entry (and its station ids) when the file changed
+        entry = manifest["files"][os.path.abspath(path)]
+        if "station_ids" in entry:
+            return entry["station_ids"]
+    station_ids = sorted(pd.read_csv(path, usecols=['station_id'], dtype={'station_id': 'str'})['station_id'].unique())
+    if entry is not None:
+        entry["station_ids"] = station_ids
+    return station_ids
+
+
+def process_station(station_id, raw_paths, variant='small', clusters=4, root=STATIONS_ROOT, models_root=MODELS_DIR):
+    """Preprocesses and mines one station from its rows in `raw_paths`; runs in a worker process.
+
+    Returns the station's summary dict.
+    """
+    from threadpoolctl import threadpool_limits
+
+    # The pool already runs one process per core: keep KMeans' OpenMP and BLAS single-threaded
+    with threadpool_limits(limits=1):
+        return _process_station(station_id, raw_paths, variant, clusters, root, models_root)
+
+
+def _process_station(station_id, raw_paths, variant, clusters, root, models_root):
+    start = time.perf_counter()
+    parts = []
+    for path in raw_paths:
+        raw = pd.read_csv(path, dtype=dict(RAW_DTYPES, station_id='str'))
+        parts.append(raw[raw['station_id'] == station_id].drop(columns=['station_id']))
+    models_dir = station_models_dir(station_id, models_root)
+    df, encoders = preprocess_frame(pd.concat(parts, ignore_index=True))
+    save_encoders(encoders, os.path.join(models_dir, os.path.basename(LABEL_ENCODER_PATH)))
+    write_partitions(df, station_id, root)
+    preprocess_s = time.perf_counter() - start
+
+    # One process per station: keep each regressor single-threaded
+    miner = TrafficMiner(models_dir=models_dir, n_jobs=1)
+    miner.df = df
+    miner.train_clustering(n_clusters=clusters)
+    miner.detect_anomalies()
+    metrics = miner.train_prediction_model(variant=variant)
+    return {'station_id': station_id, 'rows': len(df), 'preprocess_s': preprocess_s,
+            'total_s': time.perf_counter() - start, 'R2': metrics['R2'], 'MAE': metrics['MAE']}
+
+
+def process_stations(raw_dir=STATIONS_RAW_DIR, workers=None, variant='small', clusters=4, force=False,
+                     root=STATIONS_ROOT, models_root=MODELS_DIR, use_manifest=True, manifest_path=MANIFEST_PATH):
+    """Processes every station in the files of `raw_dir` across a process pool, one task per station.
+
+    A station whose files (every file containing it) and parameters are unchanged
+    since the last run is skipped (unless `force`). A failing station is reported and
+    does not stop the others; the stage records of finished stations are saved either
+    way. Returns a per-station summary frame of the stations processed, with the
+    failed station ids in `summary.attrs['failed']`.
+    """
+    paths = sorted(glob.glob(os.path.join(raw_dir, "*.csv")))
+    if not paths:
+        print(f"No station files in {raw_dir}. Run `python -m src.stations generate` first.")
+        return None
+
+    manifest = load_manifest(manifest_path) if use_manifest else None
+    station_files = {}
+    for path in paths:
+        for station_id in file_stations(path, manifest):
+            station_files.setdefault(station_id, []).append(path)
+
+    params = {'variant': variant, 'clusters': clusters}
+    keys, todo = {}, []
+    for station_id, station_paths in sorted(station_files.items()):
+        keys[station_id] = inputs_hash(station_paths, params, manifest)
+        current = (manifest is not None and stage_is_current(manifest, f"stations/{station_id}", keys[station_id])
+                   and os.path.exists(station_models_dir(station_id, models_root)))
+        if force or not current:
+            todo.append(station_id)
+    print(f"{len(todo)} of {len(station_files)} station(s) in {len(paths)} file(s) to process "
+          f"with {workers or os.cpu_count()} worker(s)")
+
+    rows, failed = [], []
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(process_station, station_id, station_files[station_id], variant, clusters,
+                                   root, models_root): station_id
+                       for station_id in todo}
+            for future in as_completed(futures):
+                station_id = futures[future]
+                try:
+                    rows.append(future.result())
+                except Exception as e:
+                    failed.append(station_id)
+                    print(f"Station {station_id} failed: {type(e).__name__}: {e}")
+                    continue
+                if manifest is not None:
+                    record_stage(manifest, f"stations/{station_id}", keys[station_id])
+    finally:
+        if manifest is not None:
+            save_manifest(manifest, manifest_path)
+    elapsed = time.perf_counter() - start
+
+    summary = pd.DataFrame(rows, columns=['station_id', 'rows', 'preprocess_s', 'total_s', 'R2', 'MAE'])
+    if len(summary):
+        summary = summary.sort_values('station_id', ignore_index=True)
+        print(summary.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    print(f"Processed {len(summary)} station(s) in {elapsed:.2f}s"
+          + (f"; {len(failed)} station(s) failed" if failed else ""))
+    summary.attrs['failed'] = failed
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate = commands.add_parser("generate", help="Write synthetic station files derived from the Metro data.")
+    generate.add_argument("--stations", type=int, default=16)
+    generate.add_argument("--output-dir", default=STATIONS_RAW_DIR)
+    generate.add_argument("--seed", type=int, default=42)
+    run = commands.add_parser("run", help="Preprocess and mine every station across a process pool.")
+    run.add_argument("--raw-dir", default=STATIONS_RAW_DIR)
+    run.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    run.add_argument("--variant", choices=list(MODEL_VARIANTS), default="small",
+                     help="Regressor variant per station (the full forest is ~300 MB per station).")
+    run.add_argument("--clusters", type=int, default=4)
+    run.add_argument("--force", action="store_true", help="Reprocess stations even if unchanged.")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate_stations(args.stations, args.output_dir, seed=args.seed)
+    else:
+        summary = process_stations(args.raw_dir, args.workers, args.variant, args.clusters, args.force)
+        sys.exit(1 if summary is not None and summary.attrs['failed'] else 0)
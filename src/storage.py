@@ -0,0 +1,137 @@
+import os
+import importlib.util
+import pandas as pd
+
+PROCESSED_DATA_PATH = os.path.join("data", "processed")
+PROCESSED_STEM = os.path.join(PROCESSED_DATA_PATH, "traffic_processed")
+ENHANCED_STEM = os.path.join(PROCESSED_DATA_PATH, "traffic_enhanced")
+
+# Columns with a small, fixed set of values are stored as categoricals / small ints
+CATEGORICAL_COLUMNS = ['weather_main', 'weather_description', 'time_slot']
+SMALL_INT_COLUMNS = {'hour': 'int8', 'day_of_week': 'int8', 'month': 'int8', 'is_weekend': 'int8', 'year': 'int16'}
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+def optimize_dtypes(df):
+    """Casts known columns to their compact storage types (timestamp, categoricals, small ints)."""
+    if 'date_time' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['date_time']):
+        df['date_time'] = pd.to_datetime(df['date_time'])
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    for col, dtype in SMALL_INT_COLUMNS.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def downcast_dtypes(df):
+    """Shrinks a frame for in-memory work: smallest integer types, float32, categorical strings.
+
+    Unlike `optimize_dtypes` this is lossy for floats, so it is not applied to stored data.
+    """
+    for col in df.columns:
+        dtype = df[col].dtype
+        if pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(dtype):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+        elif pd.api.types.is_float_dtype(dtype):
+            df[col] = df[col].astype('float32')
+        elif pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+            df[col] = df[col].astype('category')
+    return df
+
+
+def frame_memory_mb(df):
+    """Deep memory use of a frame in MB."""
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def dataset_path(stem, fmt=None):
+    """Returns the on-disk path of a dataset, preferring Parquet when it exists."""
+    parquet_path, csv_path = stem + ".parquet", stem + ".csv"
+    if fmt == "parquet":
+        return parquet_path
+    if fmt == "csv":
+        return csv_path
+    if HAS_PYARROW and os.path.exists(parquet_path):
+        return parquet_path
+    return csv_path
+
+
+def dataset_exists(stem):
+    return os.path.exists(dataset_path(stem))
+
+
+def save_dataset(df, stem, fmt=None):
+    """Saves a dataset as Parquet (typed, columnar) or CSV when pyarrow is unavailable."""
+    if fmt is None:
+        fmt = "parquet" if HAS_PYARROW else "csv"
+    path = dataset_path(stem, fmt)
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    df = optimize_dtypes(df.copy())
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+
+def _read_parquet_downcast(path, columns=None):
+    # Column by column, so only one full-width column is alive next to the compact result
+    import pyarrow.parquet as pq
+    parquet = pq.ParquetFile(path)
+    data = {}
+    for name in columns or parquet.schema_arrow.names:
+        series = parquet.read(columns=[name]).to_pandas(self_destruct=True, strings_to_categorical=True)[name]
+        data[name] = downcast_dtypes(series.to_frame())[name]
+    return pd.DataFrame(data, copy=False)
+
+
+def load_dataset(stem, columns=None, fmt=None, downcast=False):
+    """Loads a dataset, reading only `columns` if given.
+
+    Parquet keeps the stored dtypes; the CSV fallback is re-typed after parsing.
+    With `downcast`, the result is shrunk by `downcast_dtypes`; Parquet is then read
+    one column at a time so the peak stays close to the size of the compact frame.
+    """
+    path = dataset_path(stem, fmt)
+    if not os.path.exists(path):
+        return None
+
+    if path.endswith(".parquet"):
+        if downcast:
+            return _read_parquet_downcast(path, columns)
+        return pd.read_parquet(path, columns=columns)
+
+    df = pd.read_csv(path, usecols=columns)
+    df = optimize_dtypes(df)
+    return downcast_dtypes(df) if downcast else df
+
+
+def append_dataset(df, stem):
+    """Appends rows to an existing dataset (or creates it).
+
+    CSV is appended in place; Parquet is rewritten from the stored columns, which
+    avoids re-parsing text but is not a true in-place append.
+    """
+    path = dataset_path(stem)
+    if not os.path.exists(path):
+        return save_dataset(df, stem)
+
+    df = optimize_dtypes(df.copy())
+    if path.endswith(".parquet"):
+        existing = pd.read_parquet(path)
+        combined = pd.concat([existing, df[existing.columns]], ignore_index=True)
+        tmp_path = path + ".tmp"
+        optimize_dtypes(combined).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    else:
+        columns = pd.read_csv(path, nrows=0).columns
+        df[columns].to_csv(path, mode='a', header=False, index=False)
+    return path
@@ -0,0 +1,191 @@
+"""Hyperparameter search for the traffic regressor.
+
+Random Forest and gradient-boosting configurations are sampled from SEARCH_SPACES
+and compared with successive halving: every candidate is first scored with
+time-series cross-validation on the most recent fraction of each fold's training
+window, and only the best 1/factor advance to the next, larger budget. The
+(config, fold) fits of a round run in parallel.
+
+The fold features are one float32 matrix in time order (the compact mining layout),
+cached as .npy under data/processed/cv_cache/ by a hash of the processed data and
+memory-mapped by the workers. CV uses the earliest 80% of hours; the winner is refit
+on them, scored on the latest 20% and saved to RF_MODEL_PATH, where the dashboard and
+predictor load it from.
+
+Run from the project root:  python -m src.tuning [--candidates 8] [--splits 3] [--n-jobs -1]
+"""
+import os
+import glob
+import math
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+from sklearn.model_selection import ParameterSampler, TimeSeriesSplit
+from sklearn.metrics import mean_absolute_error, r2_score
+from src.storage import PROCESSED_DATA_PATH, PROCESSED_STEM, dataset_path
+from src.manifest import load_manifest, save_manifest, inputs_hash
+from src.features import MODEL_FEATURES
+from src.artifacts import save_artifact
+from src.mining import MODELS_DIR, RF_MODEL_PATH, MATRIX_COLUMNS, MODEL_SLICE, TARGET_COLUMN, TrafficMiner, set_feature_names
+
+CV_CACHE_DIR = os.path.join(PROCESSED_DATA_PATH, "cv_cache")
+LEADERBOARD_PATH = os.path.join(MODELS_DIR, "tuning_leaderboard.csv")
+
+SEARCH_SPACES = {
+    'rf': (RandomForestRegressor, {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [None, 12, 20],
+        'min_samples_leaf': [1, 3, 10],
+        'max_features': [1.0, 0.5, 'sqrt'],
+    }),
+    'hist_gb': (HistGradientBoostingRegressor, {
+        'max_iter': [200, 400],
+        'learning_rate': [0.05, 0.1, 0.2],
+        'max_leaf_nodes': [31, 63, 127],
+        'min_samples_leaf': [20, 50],
+        'l2_regularization': [0.0, 1.0],
+    }),
+}
+
+
+def make_model(family, params, n_jobs=1):
+    estimator, _ = SEARCH_SPACES[family]
+    params = dict(params, random_state=42)
+    if estimator is RandomForestRegressor:
+        params['n_jobs'] = n_jobs
+    return estimator(**params)
+
+
+def cached_matrix(cache_dir=CV_CACHE_DIR):
+    """Time-ordered float32 matrix of MATRIX_COLUMNS, memory-mapped from the CV cache.
+
+    Built (compact load of the processed data) only when the data has changed; caches
+    of earlier data versions are deleted.
+    """
+    manifest = load_manifest()
+    key = inputs_hash([dataset_path(PROCESSED_STEM)], {'columns': MATRIX_COLUMNS}, manifest)
+    save_manifest(manifest)
+    path = os.path.join(cache_dir, f"{key[:16]}.npy")
+    if not os.path.exists(path):
+        miner = TrafficMiner()
+        if not miner.load_data(compact=True):
+            return None
+        os.makedirs(cache_dir, exist_ok=True)
+        np.save(path + ".tmp.npy", miner.matrix)
+        os.replace(path + ".tmp.npy", path)
+        print(f"Cached CV features: {path}")
+    for stale in glob.glob(os.path.join(cache_dir, "*.npy")):
+        if stale != path:
+            os.remove(stale)
+    return np.load(path, mmap_mode='r')
+
+
+def fold_ranges(n_rows, n_splits):
+    """(train_end, test_start, test_end) of each expanding-window time-series fold."""
+    splitter = TimeSeriesSplit(n_splits=n_splits)
+    return [(int(train[-1]) + 1, int(test[0]), int(test[-1]) + 1) for train, test in splitter.split(np.empty((n_rows, 1)))]
+
+
+def sample_candidates(families, n_candidates, random_state=42):
+    """`n_candidates` sampled configurations per family, as (family, params) pairs."""
+    candidates = []
+    for family in families:
+        _, space = SEARCH_SPACES[family]
+        candidates += [(family, params) for params in ParameterSampler(space, n_candidates, random_state=random_state)]
+    return candidates
+
+
+def _evaluate(family, params, matrix, fold, fraction):
+    """Fits one config on the most recent `fraction` of a fold's training window and scores it."""
+    train_end, test_start, test_end = fold
+    train_start = train_end - max(1, int(train_end * fraction))
+    X_train, y_train = matrix[train_start:train_end, MODEL_SLICE], matrix[train_start:train_end, TARGET_COLUMN]
+    X_test, y_test = matrix[test_start:test_end, MODEL_SLICE], matrix[test_start:test_end, TARGET_COLUMN]
+
+    model = make_model(family, params)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - start
+    start = time.perf_counter()
+    y_pred = model.predict(X_test)
+    predict_us = (time.perf_counter() - start) / len(X_test) * 1e6
+    return {'MAE': mean_absolute_error(y_test, y_pred), 'R2': r2_score(y_test, y_pred),
+            'fit_s': fit_s, 'predict_us_per_row': predict_us}
+
+
+def successive_halving(matrix, candidates, folds, factor=3, n_jobs=-1):
+    """Scores candidates over rounds of growing training budgets, keeping the best 1/factor each round.
+
+    Returns the leaderboard: one row per candidate with the scores of the last round it reached.
+    """
+    n_rounds = 1 + int(math.log(len(candidates), factor)) if len(candidates) > 1 else 1
+    alive = list(range(len(candidates)))
+    results = {}
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for round_ in range(n_rounds):
+            fraction = float(factor) ** (round_ - n_rounds + 1)
+            start = time.perf_counter()
+            scores = parallel(delayed(_evaluate)(*candidates[i], matrix, fold, fraction)
+                              for i in alive for fold in folds)
+            for n, i in enumerate(alive):
+                fold_scores = pd.DataFrame(scores[n * len(folds):(n + 1) * len(folds)])
+                results[i] = dict(fold_scores.mean(), round=round_, train_fraction=fraction)
+            print(f"Round {round_}: {len(alive)} candidate(s) x {len(folds)} folds on {fraction:.0%} of each "
+                  f"training window in {time.perf_counter() - start:.1f}s")
+            if round_ < n_rounds - 1:
+                alive = sorted(alive, key=lambda i: results[i]['MAE'])[:max(1, math.ceil(len(alive) / factor))]
+
+    rows = [dict(family=candidates[i][0], params=candidates[i][1], **results[i]) for i in results]
+    board = pd.DataFrame(rows).sort_values(['round', 'MAE'], ascending=[False, True], ignore_index=True)
+    return board[['family', 'round', 'train_fraction', 'MAE', 'R2', 'fit_s', 'predict_us_per_row', 'params']]
+
+
+def tune(families=tuple(SEARCH_SPACES), n_candidates=8, n_splits=3, factor=3, n_jobs=-1, save=True):
+    """Runs the search, refits the winner on the training hours and (if `save`) replaces the production model.
+
+    Returns (leaderboard, holdout metrics of the winner).
+    """
+    matrix = cached_matrix()
+    if matrix is None:
+        print("Processed data not found. Run preprocessing first.")
+        return None, None
+
+    cut = int(len(matrix) * 0.8) # same time split as TrafficMiner.train_prediction_model
+    candidates = sample_candidates(families, n_candidates)
+    print(f"{len(candidates)} candidates, {n_splits}-fold time-series CV on {cut:,} rows")
+    board = successive_halving(matrix, candidates, fold_ranges(cut, n_splits), factor, n_jobs)
+
+    best = board.iloc[0]
+    model = make_model(best['family'], best['params'], n_jobs=-1)
+    start = time.perf_counter()
+    model.fit(matrix[:cut, MODEL_SLICE], matrix[:cut, TARGET_COLUMN])
+    fit_s = time.perf_counter() - start
+    y_pred = model.predict(matrix[cut:, MODEL_SLICE])
+    y_test = matrix[cut:, TARGET_COLUMN]
+    metrics = {'MAE': mean_absolute_error(y_test, y_pred), 'R2': r2_score(y_test, y_pred), 'fit_s': fit_s}
+
+    pd.set_option('display.max_colwidth', 120)
+    print(board.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    print(f"Best: {best['family']} {best['params']} -- holdout MAE {metrics['MAE']:.2f}, R2 {metrics['R2']:.3f}")
+    os.makedirs(os.path.dirname(LEADERBOARD_PATH), exist_ok=True)
+    board.to_csv(LEADERBOARD_PATH, index=False)
+    print(f"Saved leaderboard to {LEADERBOARD_PATH}")
+    if save:
+        save_artifact(set_feature_names(model, MODEL_FEATURES), RF_MODEL_PATH)
+        print(f"Saved best model to {RF_MODEL_PATH}")
+    return board, metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--families", nargs="+", choices=list(SEARCH_SPACES), default=list(SEARCH_SPACES))
+    parser.add_argument("--candidates", type=int, default=8, help="Sampled configurations per family.")
+    parser.add_argument("--splits", type=int, default=3, help="Time-series CV folds.")
+    parser.add_argument("--factor", type=int, default=3, help="Halving factor: keep the best 1/factor per round.")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Parallel (config, fold) fits.")
+    parser.add_argument("--no-save", action="store_true", help="Do not replace the production model.")
+    args = parser.parse_args()
+    tune(args.families, args.candidates, args.splits, args.factor, args.n_jobs, save=not args.no_save)
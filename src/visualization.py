@@ -1,50 +1,141 @@
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
+import numpy as np
+import inspect
 import io
+from src.instrumentation import timed
+
+
+def extreme_preserving_sample(df, n=5000):
+    """Deterministic sample of about `n` rows that keeps the extremes (as queries.scatter_sample).
+
+    Keeps anomalies (up to n / 2) and each hour's highest and lowest volume; the rest
+    is a Bernoulli sample of the normal rows by a hash of `date_time`, proportional per
+    (hour, cluster) stratum in expectation.
+    """
+    if len(df) <= n:
+        return df
+    key = pd.util.hash_pandas_object(df['date_time'] if 'date_time' in df.columns else df.index.to_series(),
+                                     index=False).to_numpy()
+    anomaly = df['is_anomaly'].to_numpy(dtype=bool) if 'is_anomaly' in df.columns else np.zeros(len(df), dtype=bool)
+    keep = np.zeros(len(df), dtype=bool)
+    max_anomalies = n // 2
+    anomaly_rows = np.flatnonzero(anomaly)
+    keep[anomaly_rows[np.argsort(key[anomaly_rows], kind='stable')[:max_anomalies]]] = True
+    grouped = df['traffic_volume'].reset_index(drop=True).groupby(df['hour'].to_numpy())
+    keep[grouped.idxmax().to_numpy()] = True
+    keep[grouped.idxmin().to_numpy()] = True
+
+    normal_rows = max(len(df) - len(anomaly_rows), 1)
+    budget = max(n - min(len(anomaly_rows), max_anomalies) - 48, 0)
+    keep |= ~anomaly & (key % 1_000_000 < 1_000_000 * budget / normal_rows)
+    return df[keep]
+
 
 class TrafficVisualizer:
-    def __init__(self, df):
+    """Traffic plots, drawn from raw rows or from precomputed aggregates.
+
+    Each plot method takes an optional aggregate/sample frame (as returned by
+    src.queries or a src.aggregates.TrafficCube); without one it uses `cube`
+    where the cube covers the plot, and falls back to the raw rows in `df`.
+    """
+    def __init__(self, df=None, cube=None):
         self.df = df
-        
-    def plot_hourly_traffic(self):
-        """Average traffic volume by hour."""
+        self.cube = cube
+
+    @staticmethod
+    def to_png(fig, dpi=100):
+        """Renders a figure to PNG bytes and closes it (for caching rendered plots)."""
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+        plt.close(fig)
+        return buffer.getvalue()
+
+    @timed("viz.plot_hourly_traffic")
+    def plot_hourly_traffic(self, hourly=None):
+        """Average traffic volume by hour.
+
+        `hourly`: mean volume per (hour, day_of_week), e.g. queries.hourly_by_weekday.
+        """
+        if hourly is None and self.cube is not None:
+            hourly = self.cube.hourly_by_weekday()
+        data = hourly if hourly is not None else self.df
         fig, ax = plt.subplots(figsize=(10, 5))
-        sns.lineplot(data=self.df, x='hour', y='traffic_volume', hue='day_of_week', palette='viridis', errorbar=None, ax=ax)
+        sns.lineplot(data=data, x='hour', y='traffic_volume', hue='day_of_week', palette='viridis', errorbar=None, ax=ax)
         ax.set_title("Average Hourly Traffic Volume by Day of Week")
         ax.set_ylabel("Traffic Volume")
         ax.set_xlabel("Hour of Day")
         ax.grid(True, linestyle='--', alpha=0.7)
         return fig
-    
-    def plot_weather_impact(self):
-        """Traffic volume distribution by weather."""
+
+    @timed("viz.plot_weather_impact")
+    def plot_weather_impact(self, box_stats=None):
+        """Traffic volume distribution by weather.
+
+        `box_stats`: per-description q1/median/q3/whiskers, e.g. queries.weather_box_stats.
+        """
+        if box_stats is None and self.cube is not None:
+            box_stats = self.cube.weather_box_stats()
+        if box_stats is not None:
+            return self._plot_weather_box_stats(box_stats)
+
         fig, ax = plt.subplots(figsize=(12, 6))
         # Top 10 weather descriptions by frequency for readability
         top_weather = self.df['weather_description'].value_counts().nlargest(10).index
-        sns.boxplot(data=self.df[self.df['weather_description'].isin(top_weather)], 
-                    x='traffic_volume', y='weather_description', hue='weather_description', legend=False, ax=ax, palette="coolwarm")
+        sns.boxplot(data=self.df[self.df['weather_description'].isin(top_weather)],
+                    x='traffic_volume', y='weather_description', hue='weather_description', legend=False, ax=ax, palette="coolwarm",
+                    order=list(top_weather), hue_order=list(top_weather))
+        ax.set_title("Traffic Volume Distribution by Top Weather Conditions")
+        return fig
+
+    def _plot_weather_box_stats(self, box_stats):
+        fig, ax = plt.subplots(figsize=(12, 6))
+        # Most frequent first, drawn top to bottom like the raw-row version
+        rows = box_stats.iloc[::-1]
+        stats = [{'label': r.weather_description, 'med': r.median, 'q1': r.q1, 'q3': r.q3,
+                  'whislo': r.whislo, 'whishi': r.whishi, 'fliers': []} for r in rows.itertuples()]
+        if 'orientation' in inspect.signature(ax.bxp).parameters:
+            orientation = {'orientation': 'horizontal'}
+        else:
+            orientation = {'vert': False}
+        boxes = ax.bxp(stats, patch_artist=True, showfliers=False, **orientation)
+        for patch, color in zip(boxes['boxes'], sns.color_palette("coolwarm", len(stats))[::-1]):
+            patch.set_facecolor(color)
+        ax.set_xlabel("traffic_volume")
+        ax.set_ylabel("weather_description")
         ax.set_title("Traffic Volume Distribution by Top Weather Conditions")
         return fig
 
-    def plot_anomalies(self):
+    @timed("viz.plot_correlation")
+    def plot_correlation(self, corr=None, columns=('traffic_volume', 'temp', 'rain_1h', 'snow_1h', 'clouds_all', 'hour')):
+        """Correlation heatmap; `corr` is a precomputed matrix, e.g. queries.correlation."""
+        if corr is None:
+            corr = self.df[list(columns)].corr()
+        fig, ax = plt.subplots(figsize=(10, 6))
+        sns.heatmap(corr, annot=True, cmap='coolwarm', ax=ax)
+        return fig
+
+    @timed("viz.plot_anomalies")
+    def plot_anomalies(self, sample=None):
         """Scatter plot of Anomalies vs Normal traffic."""
-        if 'is_anomaly' not in self.df.columns: return None
-        
+        if sample is None:
+            if 'is_anomaly' not in self.df.columns: return None
+            sample = extreme_preserving_sample(self.df)
+
         fig, ax = plt.subplots(figsize=(12, 6))
-        # Sample for performance if too large
-        plot_data = self.df.sample(n=min(5000, len(self.df)), random_state=42)
-        
-        sns.scatterplot(data=plot_data, x='hour', y='traffic_volume', hue='is_anomaly', 
+        sns.scatterplot(data=sample, x='hour', y='traffic_volume', hue='is_anomaly',
                         style='is_anomaly', palette={False: 'blue', True: 'red'}, alpha=0.6, ax=ax)
         ax.set_title("Detected Traffic Anomalies (Sampled)")
         return fig
-    
-    def plot_cluster_segments(self):
-        if 'cluster' not in self.df.columns: return None
-        
+
+    @timed("viz.plot_cluster_segments")
+    def plot_cluster_segments(self, sample=None):
+        if sample is None:
+            if 'cluster' not in self.df.columns: return None
+            sample = extreme_preserving_sample(self.df)
+
         fig, ax = plt.subplots(figsize=(10, 6))
-        sns.scatterplot(data=self.df.sample(n=min(5000, len(self.df)), random_state=42), 
-                        x='hour', y='traffic_volume', hue='cluster', palette='tab10', alpha=0.5, ax=ax)
+        sns.scatterplot(data=sample, x='hour', y='traffic_volume', hue='cluster', palette='tab10', alpha=0.5, ax=ax)
         ax.set_title("Traffic Clusters: Volume vs Hour")
         return fig
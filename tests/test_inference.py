@@ -0,0 +1,89 @@
+import threading
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesRegressor, GradientBoostingRegressor, RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+from src.inference import FlatForest, PredictionCache, _walk_rows
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 6)).astype(np.float32)
+    y = 3 * X[:, 0] - 2 * X[:, 1] ** 2 + np.sin(X[:, 2]) + rng.normal(scale=0.1, size=len(X))
+    return X[:1500], y[:1500], X[1500:]
+
+
+@pytest.fixture(scope="module", params=[RandomForestRegressor, ExtraTreesRegressor, DecisionTreeRegressor])
+def fitted(request, data):
+    X_train, y_train, _ = data
+    params = {'random_state': 0} if request.param is DecisionTreeRegressor else {'n_estimators': 20, 'random_state': 0}
+    return request.param(**params).fit(X_train, y_train)
+
+
+def test_batch_matches_sklearn(fitted, data):
+    X_test = data[2]
+    np.testing.assert_allclose(FlatForest.from_model(fitted).predict(X_test), fitted.predict(X_test), rtol=0, atol=1e-9)
+
+
+def test_single_row_matches_sklearn(fitted, data):
+    forest = FlatForest.from_model(fitted)
+    for row in data[2][:50]:
+        np.testing.assert_allclose(forest.predict(row[None, :]), fitted.predict(row[None, :]), rtol=0, atol=1e-9)
+
+
+def test_row_kernel_matches_sklearn(fitted, data):
+    forest = FlatForest.from_model(fitted)
+    X_test = data[2][:100]
+    walked = _walk_rows(forest._prepare(X_test), forest.roots, forest.feature, forest.threshold,
+                        forest.left, forest.right, forest.value)
+    np.testing.assert_allclose(walked, fitted.predict(X_test), rtol=0, atol=1e-9)
+
+
+def test_rejects_boosting(data):
+    X_train, y_train, _ = data
+    model = GradientBoostingRegressor(n_estimators=5, random_state=0).fit(X_train, y_train)
+    with pytest.raises(ValueError, match="Cannot flatten"):
+        FlatForest.from_model(model)
+
+
+def test_cache_returns_model_predictions(data):
+    X_train, y_train, X_test = data
+    model = RandomForestRegressor(n_estimators=10, random_state=0).fit(X_train, y_train)
+    cache = PredictionCache(maxsize=len(X_test))
+    batch = np.concatenate([X_test, X_test[:100]])
+    np.testing.assert_allclose(cache.predict(batch, model.predict), model.predict(batch), rtol=0, atol=1e-9)
+    np.testing.assert_allclose(cache.predict(batch, model.predict), model.predict(batch), rtol=0, atol=1e-9)
+    assert cache.stats()['hits'] == len(X_test)
+
+
+def test_rounded_cache_scores_exact_rows():
+    calls = []
+    cache = PredictionCache(decimals=1)
+    X = np.array([[0.123, 1.0], [0.1, 1.0]], dtype=np.float32)
+    result = cache.predict(X, lambda rows: calls.append(rows.copy()) or rows[:, 0].astype(float))
+    assert len(calls) == 1 and len(calls[0]) == 1
+    assert calls[0][0, 0] in X[:, 0]
+    assert result[0] == result[1]
+
+
+def test_cache_is_thread_safe():
+    cache = PredictionCache(maxsize=50)
+    errors = []
+
+    def worker(seed):
+        rng = np.random.default_rng(seed)
+        try:
+            for _ in range(200):
+                X = rng.integers(0, 100, size=(5, 3)).astype(np.float32)
+                np.testing.assert_array_equal(cache.predict(X, lambda rows: rows.sum(axis=1)), X.sum(axis=1))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(cache) <= 50
@@ -0,0 +1,33 @@
+import os
+import joblib
+import pandas as pd
+import pytest
+from src.preprocessing import RAW_DATA_PATH, load_and_preprocess, stream_preprocess
+from src.storage import load_dataset
+
+
+@pytest.fixture
+def raw_csv(tmp_path):
+    """A shuffled slice of the raw data with duplicate timestamps, so runs and merges are exercised."""
+    if not os.path.exists(RAW_DATA_PATH):
+        pytest.skip("raw dataset not downloaded")
+    raw = pd.read_csv(RAW_DATA_PATH, nrows=3000)
+    raw = pd.concat([raw, raw.sample(300, random_state=1)]).sample(frac=1, random_state=0)
+    path = tmp_path / "raw.csv"
+    raw.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize("chunksize", [500, 1000, 10_000])
+def test_stream_matches_in_memory(raw_csv, tmp_path, chunksize):
+    load_and_preprocess(raw_csv, str(tmp_path / "memory"), str(tmp_path / "memory.pkl"))
+    stream_preprocess(raw_csv, str(tmp_path / "stream"), str(tmp_path / "stream.pkl"),
+                      chunksize=chunksize, tmp_dir=str(tmp_path))
+
+    expected = load_dataset(str(tmp_path / "memory"))
+    streamed = load_dataset(str(tmp_path / "stream"))
+    assert not expected['date_time'].duplicated().any()
+    pd.testing.assert_frame_equal(streamed, expected)
+    for name in ('main', 'desc'):
+        assert list(joblib.load(tmp_path / "stream.pkl")[name].classes_) == \
+            list(joblib.load(tmp_path / "memory.pkl")[name].classes_)
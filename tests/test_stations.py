@@ -0,0 +1,49 @@
+import os
+import pandas as pd
+import pytest
+from src.preprocessing import RAW_DATA_PATH, preprocess_frame
+from src.stations import load_station, process_stations
+
+
+@pytest.fixture
+def station_files(tmp_path):
+    """S0001 split over two files, one of which also holds S0002 and is not named after a station."""
+    if not os.path.exists(RAW_DATA_PATH):
+        pytest.skip("raw dataset not downloaded")
+    raw = pd.read_csv(RAW_DATA_PATH, nrows=2000)
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    raw.iloc[:1000].assign(station_id="S0001").to_csv(raw_dir / "S0001.csv", index=False)
+    pd.concat([raw.iloc[1000:].assign(station_id="S0001"), raw.assign(station_id="S0002")]) \
+        .to_csv(raw_dir / "north.csv", index=False)
+    return raw, raw_dir
+
+
+def run(raw_dir, tmp_path):
+    return process_stations(str(raw_dir), workers=1, root=str(tmp_path / "processed"),
+                            models_root=str(tmp_path / "models"), manifest_path=str(tmp_path / "manifest.json"))
+
+
+def test_station_split_over_files(station_files, tmp_path):
+    raw, raw_dir = station_files
+    summary = run(raw_dir, tmp_path)
+    assert list(summary['station_id']) == ["S0001", "S0002"]
+    assert not summary.attrs['failed']
+
+    expected, _ = preprocess_frame(raw)
+    for station_id in ("S0001", "S0002"):
+        stored = load_station(station_id, root=str(tmp_path / "processed"))
+        assert len(stored) == len(expected)
+        pd.testing.assert_series_equal(stored['date_time'], expected['date_time'], check_names=False)
+        assert os.path.exists(tmp_path / "models" / station_id)
+
+
+def test_unchanged_stations_are_skipped(station_files, tmp_path):
+    _, raw_dir = station_files
+    run(raw_dir, tmp_path)
+    assert len(run(raw_dir, tmp_path)) == 0
+
+    # A station is current only while every file that contains it is unchanged
+    extra = pd.read_csv(raw_dir / "S0001.csv").iloc[:10]
+    extra.assign(date_time="2030-01-01 00:00:00").to_csv(raw_dir / "S0001.csv", mode="a", header=False, index=False)
+    assert list(run(raw_dir, tmp_path)['station_id']) == ["S0001"]